@@ -1,9 +1,52 @@
 # input_collector.py
 from flask import jsonify, request,render_template
-from constant.constant import MAX_INPUT_LENGTH
-import os
+from constant.constant import MAX_INPUT_LENGTH, AUDIO_SPOOL_MAX_SIZE
+import tempfile
 import speech_recognition as sr
 
+# 文件头 -> sr.AudioFile 按 WAV、AIFF、FLAC 顺序尝试解析时，在匹配格式之前需要跳过的解析次数
+AUDIO_FORMAT_PROBES = {
+    b"RIFF": 0,  # WAV
+    b"FORM": 1,  # AIFF / AIFF-C
+    b"fLaC": 2,  # FLAC
+}
+
+
+class ProbeSkippingStream:
+    """
+    sr.AudioFile 在同一个文件对象上依次尝试 WAV、AIFF、FLAC，失败的尝试不会回到开头，
+    非 WAV 的内存缓冲区因此会从错误的位置开始解析。
+    该包装让与文件头不匹配的尝试第一次 read 即读到空数据（抛出 EOFError，不移动读取位置），
+    匹配的格式从头开始读取
+    """
+
+    def __init__(self, fileobj, skip_probes):
+        self._fileobj = fileobj
+        self._skip_probes = skip_probes
+
+    def read(self, size=-1):
+        if self._skip_probes:
+            self._skip_probes -= 1
+            return b""
+        return self._fileobj.read(size)
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
+
+
+def sniff_audio_stream(fileobj):
+    """
+    根据文件头包装音频文件对象，使 sr.AudioFile 直接按实际格式解析
+    :param fileobj: 可读、可 seek 的文件对象
+    :return: 回到开头的文件对象（WAV 或未知格式原样返回）
+    """
+    fileobj.seek(0)
+    header = fileobj.read(4)
+    fileobj.seek(0)
+    skip_probes = AUDIO_FORMAT_PROBES.get(header, 0)
+    return ProbeSkippingStream(fileobj, skip_probes) if skip_probes else fileobj
+
+
 class InputCollector:
     def __init__(self, app):
         self.app = app
@@ -68,20 +111,11 @@ class InputCollector:
                 return jsonify({"error": "未选择文件"}), 400
 
             try:
-                # 创建存储目录（如果不存在）
-                storage_dir = os.path.join(os.getcwd(), 'audio_uploads')
-                os.makedirs(storage_dir, exist_ok=True)
-
-                # 构建安全的文件路径
-                filename = os.path.basename(file.filename)  # 防止路径遍历攻击
-                file_path = os.path.join(storage_dir, filename)
-
-                # 保存并处理文件
-                file.save(file_path)
-                text = self.recognize_audio(file_path)
-
-                # 处理完成后清理
-                os.remove(file_path)
+                # 上传内容缓冲在内存中，超过 AUDIO_SPOOL_MAX_SIZE 才转存到唯一命名的临时文件，
+                # 不使用客户端文件名，并发上传互不覆盖；退出 with 时自动清理
+                with tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_SIZE) as buffer:
+                    file.save(buffer)
+                    text = self.recognize_audio(buffer)
 
                 if not text:
                     return jsonify({"error": "无法识别音频内容"}), 500
@@ -94,9 +128,15 @@ class InputCollector:
                 return jsonify({"error": str(e)}), 500
 
 
-    def recognize_audio(self, file_path):
-        """执行实际的语音识别操作"""
-        with sr.AudioFile(file_path) as source:
+    def recognize_audio(self, audio_source):
+        """
+        执行实际的语音识别操作
+        :param audio_source: 音频文件路径，或可读、可 seek 的文件对象（如上传缓冲区）
+        :return: 识别出的文本，无法识别时返回 None
+        """
+        if hasattr(audio_source, "read"):
+            audio_source = sniff_audio_stream(audio_source)
+        with sr.AudioFile(audio_source) as source:
             audio = self.recognizer.record(source)
             try:
                 text = self.recognizer.recognize_google(audio, language="zh-CN")
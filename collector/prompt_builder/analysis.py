@@ -0,0 +1,110 @@
+from functools import cached_property
+from collector.prompt_builder.lazy import JIEBA
+from collector.prompt_builder.slot_extractor import SLOT_AUTOMATON, extract_slot_spans, slots_from_matches
+
+
+def _jieba_tokenize(text):
+    return list(JIEBA.get().cut(text, cut_all=False))
+
+
+class TextAnalysis:
+    """
+    单次请求的文本分析结果
+    分词、关键词命中、槽位和句法分析都在第一次访问时计算并缓存，
+    下单检测、槽位提取和意图分类共用同一份结果，避免对同一句话重复分词和扫描
+    """
+
+    def __init__(self, text, tokenizer=None):
+        """
+        :param text: 清洗后的用户输入
+        :param tokenizer: 分词函数 text -> list[str]，默认使用 jieba 精确模式
+        """
+        self.text = text or ""
+        self._tokenizer = tokenizer or _jieba_tokenize
+        self._keyword_hits = {}
+        self._syntax = None
+        self._syntax_loaded = False
+
+    @cached_property
+    def tokens(self):
+        """分词结果（拼接后与原文一致）"""
+        return self._tokenizer(self.text) if self.text else []
+
+    @cached_property
+    def tokenized_text(self):
+        """以空格连接的分词结果"""
+        return " ".join(self.tokens)
+
+    @cached_property
+    def token_ends(self):
+        """每个词在原文中的结束位置"""
+        ends, offset = [], 0
+        for token in self.tokens:
+            offset += len(token)
+            ends.append(offset)
+        return ends
+
+    def keyword_hits(self, automaton, within_tokens=False):
+        """
+        获取某个关键词自动机在原文上的命中，每个自动机每次请求只扫描一次
+        :param automaton: KeywordAutomaton
+        :param within_tokens: 只保留落在单个词内部的命中（与在分词结果上做 `in` 判断一致）
+        :return: list of (start, end, keyword, payload)
+        """
+        key = id(automaton)
+        if key not in self._keyword_hits:
+            self._keyword_hits[key] = (automaton, automaton.find_all(self.text))
+        hits = self._keyword_hits[key][1]
+        if within_tokens:
+            ends = self.token_ends
+            hits = [hit for hit in hits if not any(hit[0] < end < hit[1] for end in ends)]
+        return hits
+
+    @cached_property
+    def slot_matches(self):
+        """带位置和来源的槽位提取结果"""
+        return extract_slot_spans(self.text, self.tokens, hits=self.keyword_hits(SLOT_AUTOMATON))
+
+    @cached_property
+    def slots(self):
+        """槽位字典（只读使用，需要修改时请复制）"""
+        return slots_from_matches(self.slot_matches)
+
+    @property
+    def syntax_loaded(self):
+        return self._syntax_loaded
+
+    def syntax(self, analyzer):
+        """
+        句法分析结果，首次访问时调用 analyzer(text) 计算
+        :param analyzer: 句法分析函数 text -> [(word, postag, arc), ...]
+        """
+        if not self._syntax_loaded:
+            self.store_syntax(analyzer(self.text))
+        return self._syntax
+
+    def store_syntax(self, syntax_result):
+        """写入外部（如批量调用）得到的句法分析结果"""
+        self._syntax = syntax_result
+        self._syntax_loaded = True
+
+
+def ensure_analysis(text, tokenizer=None):
+    """字符串转换为 TextAnalysis，已是 TextAnalysis 时原样返回"""
+    if isinstance(text, TextAnalysis):
+        return text
+    return TextAnalysis(text, tokenizer)
+
+
+def as_text(text):
+    """取出 TextAnalysis 中的文本，字符串原样返回"""
+    if isinstance(text, TextAnalysis):
+        return text.text
+    return text or ""
+
+
+def find_hits(text, automaton):
+    """在字符串或 TextAnalysis 上查找关键词命中，后者会复用本次请求的扫描结果"""
+    if isinstance(text, TextAnalysis):
+        return text.keyword_hits(automaton)
+    return automaton.find_all(text or "")
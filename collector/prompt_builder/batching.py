@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchQueueFull(RuntimeError):
+    """等待队列已满，调用方应降级或稍后重试"""
+
+
+class MicroBatcher:
+    """
+    动态微批处理器
+    并发请求先进入等待队列，后台线程在 max_wait_ms 时间窗口内或凑满 max_batch_size 后
+    调用一次 batch_fn 批量处理，再把结果分别交还给各调用方
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5, max_queue_size=256,
+                 timeout=2.0, name="micro-batcher"):
+        """
+        :param batch_fn: 批处理函数，接收输入列表，返回等长的结果列表
+        :param max_batch_size: 单批最大条数
+        :param max_wait_ms: 首条请求到达后最多等待多久凑批（毫秒）
+        :param max_queue_size: 等待队列上限，超过时直接拒绝（背压）
+        :param timeout: 单个请求默认等待结果的超时（秒）
+        :param name: 后台线程名称
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def submit(self, item):
+        """
+        提交一条请求
+        :return: concurrent.futures.Future
+        :raises BatchQueueFull: 等待队列已满
+        """
+        if self._closed:
+            raise RuntimeError(f"{self.name} 已关闭")
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            raise BatchQueueFull(f"{self.name} 等待队列已满（{self._queue.maxsize}）")
+        return future
+
+    def process(self, item, timeout=None):
+        """
+        提交并同步等待结果
+        :param timeout: 超时秒数，默认使用构造时的 timeout
+        :raises concurrent.futures.TimeoutError: 超时未完成
+        """
+        future = self.submit(item)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except Exception:
+            # 超时后取消，后台线程不会再处理该请求
+            future.cancel()
+            raise
+
+    def _collect(self):
+        """阻塞等待首条请求，再在时间窗口内尽量凑满一批"""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._closed or not self._queue.empty():
+            batch = self._collect()
+            # 跳过调用方已超时取消的请求
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} 批处理结果数量与输入不一致")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self, wait=True):
+        """停止接收新请求，处理完队列中剩余请求后退出"""
+        self._closed = True
+        if wait and self._worker is not None:
+            self._worker.join()
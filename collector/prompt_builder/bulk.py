@@ -0,0 +1,115 @@
+import itertools
+import os
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# index 为输入中的位置；构建失败时 prompt 为 None，error 为错误信息
+BulkResult = namedtuple("BulkResult", ["index", "prompt", "error"])
+
+# 每个工作进程各自持有一个 PromptBuilder，在初始化函数中创建
+_WORKER_BUILDER = None
+
+
+def _create_builder(builder_options):
+    from collector.prompt_builder.prompt import PromptBuilder
+    builder = PromptBuilder(**(builder_options or {}))
+    builder.warmup()
+    return builder
+
+
+def _init_worker(builder_options):
+    """工作进程初始化：加载词典、意图模型和模板，之后处理的每个分块都复用"""
+    global _WORKER_BUILDER
+    _WORKER_BUILDER = _create_builder(builder_options)
+
+
+def _as_kwargs(request):
+    """
+    输入可以是字符串（用户输入）或 build_prompt 的参数字典（text 可作为 input_text 的别名）
+    """
+    if isinstance(request, str):
+        return {"input_text": request}
+    kwargs = dict(request)
+    if "input_text" not in kwargs and "text" in kwargs:
+        kwargs["input_text"] = kwargs.pop("text")
+    return kwargs
+
+
+def _build_chunk(builder, chunk):
+    results = []
+    for index, request in chunk:
+        try:
+            results.append(BulkResult(index, builder.build_prompt(**_as_kwargs(request)), None))
+        except Exception as e:
+            results.append(BulkResult(index, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _build_chunk_in_worker(chunk):
+    return _build_chunk(_WORKER_BUILDER, chunk)
+
+
+def _chunks(requests, chunksize):
+    iterator = enumerate(requests)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def build_prompts(requests, workers=None, chunksize=32, ordered=True, builder_options=None, max_pending=None):
+    """
+    批量构建提示词（离线生成评测、微调数据）
+    输入按需分块读取，同时在途的分块数有上限，内存占用与输入总量无关
+    :param requests: 可迭代的输入，每项为字符串或 build_prompt 参数字典
+    :param workers: 工作进程数，默认 CPU 核数；为 1 时在当前进程中执行
+    :param chunksize: 每个任务包含的输入条数
+    :param ordered: True 按输入顺序输出，False 按完成顺序输出
+    :param builder_options: 创建 PromptBuilder 的参数（需可 pickle）
+    :param max_pending: 同时在途的分块数上限，默认 workers * 2
+    :return: BulkResult 的生成器
+    """
+    if chunksize <= 0:
+        raise ValueError("chunksize 必须大于 0")
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(requests, chunksize)
+
+    if workers == 1:
+        builder = _create_builder(builder_options)
+        for chunk in chunks:
+            yield from _build_chunk(builder, chunk)
+        return
+
+    max_pending = max_pending or workers * 2
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(builder_options,))
+    pending = deque()
+
+    def submit_next():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        pending.append(executor.submit(_build_chunk_in_worker, chunk))
+        return True
+
+    try:
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        if ordered:
+            while pending:
+                results = pending.popleft().result()
+                submit_next()
+                yield from results
+        else:
+            running = set(pending)
+            pending.clear()
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if submit_next():
+                        running.add(pending.popleft())
+                    yield from future.result()
+    finally:
+        # 调用方提前停止迭代时取消尚未开始的分块
+        executor.shutdown(wait=True, cancel_futures=True)
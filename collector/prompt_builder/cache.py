@@ -0,0 +1,155 @@
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collector.prompt_builder.metrics import METRICS
+
+_WHITESPACE = re.compile(r"\s+")
+_MISSING = object()
+
+
+def normalize_text(text):
+    """
+    缓存键使用的文本归一化：全角转半角（NFKC）、合并连续空白、去除首尾空白
+    """
+    if not text:
+        return ""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def slot_fingerprint(slots):
+    """将槽位字典转换为可哈希且与插入顺序无关的指纹"""
+    if not slots:
+        return ()
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in slots.items()
+    ))
+
+
+def classification_key(text, slots, version):
+    """意图分类缓存键：归一化文本 + 槽位指纹 + 模型/规则版本"""
+    return normalize_text(text), slot_fingerprint(slots), version
+
+
+class LRUCache:
+    """
+    线程安全的有界 LRU 缓存，可选按 TTL 过期、按总字节数淘汰，记录命中、未命中、淘汰与过期次数
+    """
+
+    def __init__(self, maxsize=1024, name=None, ttl=None, clock=time.monotonic, max_bytes=None,
+                 sizeof=sys.getsizeof, metrics=None):
+        """
+        :param maxsize: 最大条数
+        :param name: 缓存名，提供时命中/未命中同时计入 metrics 的 cache_hits_total / cache_misses_total
+        :param ttl: 条目有效期（秒），None 表示不过期
+        :param clock: 时间函数，测试时可替换
+        :param max_bytes: 所有值的估算总字节数上限，None 表示只按条数淘汰
+        :param sizeof: 估算单个值字节数的函数，仅在设置 max_bytes 时使用
+        :param metrics: MetricsRegistry，默认为进程级 METRICS
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize 必须大于 0")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl 必须大于 0")
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes 必须大于 0")
+        self.maxsize = maxsize
+        self.name = name
+        self.metrics = metrics
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def _lookup(self, key):
+        """取出未过期的值（调用方持有锁），过期条目顺带删除"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or self.ttl is None:
+            return entry
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            return _MISSING
+        return value
+
+    def _remove(self, key):
+        """删除条目并扣减字节数（调用方持有锁）"""
+        del self._data[key]
+        self._bytes -= self._sizes.pop(key, 0)
+
+    def _over_limit(self):
+        return len(self._data) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if self.name:
+            metrics = self.metrics or METRICS
+            metrics.inc("cache_misses_total" if value is _MISSING else "cache_hits_total", cache=self.name)
+        return default if value is _MISSING else value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = value if self.ttl is None else (self._clock() + self.ttl, value)
+            if self.max_bytes is not None:
+                self._sizes[key] = self._sizeof(value)
+                self._bytes += self._sizes[key]
+            # 单个值超过 max_bytes 时自身也会被淘汰，即不缓存
+            while self._data and self._over_limit():
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                return default
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
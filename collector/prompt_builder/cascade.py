@@ -0,0 +1,105 @@
+import threading
+from collector.prompt_builder.analysis import ensure_analysis
+from collector.prompt_builder.config import CASCADE_THRESHOLDS
+from collector.prompt_builder.metrics import METRICS
+
+CASCADE_TIERS = ("rule", "ml", "syntax")
+
+
+def _margin(ranked):
+    """排序结果中第一名与第二名的得分差"""
+    if not ranked:
+        return 0
+    if len(ranked) == 1:
+        return ranked[0][1]
+    return ranked[0][1] - ranked[1][1]
+
+
+class CascadeIntentClassifier:
+    """
+    置信度分级的意图分类：
+    1. 关键词规则（IntentClassifier）第一、二名得分差足够大时直接返回；
+    2. 否则运行 TF-IDF + LR（不做句法分析），得分差足够大时返回；
+    3. 仍不确定时再叠加 LTP 句法分析得分
+    """
+
+    def __init__(self, rule_classifier, ml_classifier, rule_margin=None, ml_margin=None, debug=False, metrics=None):
+        """
+        :param rule_classifier: IntentClassifier
+        :param ml_classifier: IntentClassifierML（已加载或训练好的模型）
+        :param rule_margin: 规则得分差阈值，默认取 CASCADE_THRESHOLDS["rule_margin"]
+        :param ml_margin: 模型得分差阈值，默认取 CASCADE_THRESHOLDS["ml_margin"]
+        :param debug: 是否打印每次分类的结果与级别
+        :param metrics: 各级命中次数统计使用的 MetricsRegistry，默认为进程级 METRICS
+        """
+        self.rule_classifier = rule_classifier
+        self.ml_classifier = ml_classifier
+        self.rule_margin = CASCADE_THRESHOLDS["rule_margin"] if rule_margin is None else rule_margin
+        self.ml_margin = CASCADE_THRESHOLDS["ml_margin"] if ml_margin is None else ml_margin
+        self.debug = debug
+        self.metrics = metrics or METRICS
+        self._lock = threading.Lock()
+        self._tier_counts = dict.fromkeys(CASCADE_TIERS, 0)
+
+    def warmup(self, syntax=True):
+        """
+        预加载模型
+        :param syntax: 是否同时加载 LTP 句法分析模型
+        """
+        self.ml_classifier.warmup(syntax=syntax)
+
+    def _record(self, tier):
+        with self._lock:
+            self._tier_counts[tier] += 1
+        self.metrics.inc("intent_cascade_total", tier=tier)
+
+    def tier_stats(self):
+        """各级命中次数与占比，用于调整阈值"""
+        with self._lock:
+            counts = dict(self._tier_counts)
+        total = sum(counts.values())
+        return {
+            "total": total,
+            "counts": counts,
+            "ratios": {tier: (count / total if total else 0.0) for tier, count in counts.items()},
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._tier_counts = dict.fromkeys(CASCADE_TIERS, 0)
+
+    def rank_with_tier(self, text, slots=None):
+        """
+        :param text: 用户输入文本或 TextAnalysis
+        :param slots: 槽位字典（可选）
+        :return: (排序结果 [(intent, score), ...], 作出判断的级别)
+        """
+        analysis = ensure_analysis(text, self.ml_classifier._tokenize)
+
+        ranked = self.rule_classifier.rank(analysis, slots, top_k=2)
+        if ranked and ranked[0][1] > 0 and _margin(ranked) >= self.rule_margin:
+            self._record("rule")
+            return self.rule_classifier.rank(analysis, slots), "rule"
+
+        ranked = self.ml_classifier.classify_batch([analysis], [slots], use_syntax=False)[0]
+        if _margin(ranked) >= self.ml_margin:
+            self._record("ml")
+            return ranked, "ml"
+
+        self._record("syntax")
+        return self.ml_classifier.apply_syntax(analysis, ranked), "syntax"
+
+    def rank(self, text, slots=None):
+        return self.rank_with_tier(text, slots)[0]
+
+    def classify(self, text, slots=None):
+        """
+        :param text: 用户输入文本或 TextAnalysis
+        :param slots: 槽位字典（可选）
+        :return: 得分最高的意图
+        """
+        ranked, tier = self.rank_with_tier(text, slots)
+        intent = ranked[0][0] if ranked else "order"
+        if self.debug:
+            print(f"[INFO] 级联意图识别: {intent}（{tier}）")
+        return intent
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+import numpy as np
+from collector.prompt_builder.model_store import _atomic_write
+
+# 紧凑格式版本，修改存储结构时递增
+COMPACT_FORMAT_VERSION = 1
+COMPACT_DIR = "compact"
+META_FILE = "meta.json"
+ARRAY_FILES = ("term_hashes", "idf", "coef", "intercept")
+
+
+def term_hash(term):
+    """词项的 64 位稳定哈希，替代 Python 词表字典"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _save_array(path, array):
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+
+    _atomic_write(path, write)
+
+
+def export_compact_model(pipeline, model_dir):
+    """
+    将 TfidfVectorizer + LogisticRegression 流水线导出为可内存映射的紧凑格式：
+    词表换成排好序的 uint64 哈希数组，idf 与系数矩阵只保留词表中出现的行并使用 float32
+    :param pipeline: 训练好的 sklearn Pipeline（tfidf, clf）
+    :param model_dir: 模型产物目录，紧凑格式写入其下的 compact/ 子目录
+    :return: 紧凑格式目录
+    """
+    vectorizer = pipeline.named_steps['tfidf']
+    clf = pipeline.named_steps['clf']
+    if vectorizer.analyzer != "word" or tuple(vectorizer.ngram_range) != (1, 1):
+        raise ValueError("紧凑格式只支持 analyzer='word' 且 ngram_range=(1, 1) 的 TfidfVectorizer")
+    if vectorizer.norm not in ("l2", None):
+        raise ValueError(f"紧凑格式不支持 norm={vectorizer.norm}")
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    hashes = np.array([term_hash(term) for term in terms], dtype=np.uint64)
+    if len(set(hashes.tolist())) != len(hashes):
+        raise ValueError("词项哈希冲突，无法导出紧凑格式")
+    order = np.argsort(hashes)
+
+    if vectorizer.use_idf:
+        idf = vectorizer.idf_.astype(np.float32)
+    else:
+        idf = np.ones(len(terms), dtype=np.float32)
+    coef = np.ascontiguousarray(clf.coef_.T.astype(np.float32))
+
+    multi_class = getattr(clf, "multi_class", "auto")
+    if len(clf.classes_) == 2:
+        prob_mode = "binary"
+    elif multi_class == "ovr":
+        prob_mode = "ovr"
+    else:
+        prob_mode = "multinomial"
+
+    compact_dir = os.path.join(model_dir, COMPACT_DIR)
+    os.makedirs(compact_dir, exist_ok=True)
+    _save_array(os.path.join(compact_dir, "term_hashes.npy"), hashes[order])
+    _save_array(os.path.join(compact_dir, "idf.npy"), idf[order])
+    _save_array(os.path.join(compact_dir, "coef.npy"), coef[order])
+    _save_array(os.path.join(compact_dir, "intercept.npy"), clf.intercept_.astype(np.float32))
+
+    meta = {
+        "format_version": COMPACT_FORMAT_VERSION,
+        "classes": clf.classes_.tolist(),
+        "token_pattern": vectorizer.token_pattern,
+        "lowercase": vectorizer.lowercase,
+        "sublinear_tf": vectorizer.sublinear_tf,
+        "norm": vectorizer.norm,
+        "prob_mode": prob_mode,
+    }
+
+    def write_meta(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    _atomic_write(os.path.join(compact_dir, META_FILE), write_meta)
+    return compact_dir
+
+
+class CompactIntentModel:
+    """
+    紧凑格式的意图模型
+    数组以只读内存映射方式加载，多个预 fork 的 worker 共享同一份物理页；
+    推理时不需要导入 scikit-learn
+    """
+
+    def __init__(self, meta, term_hashes, idf, coef, intercept):
+        self.classes_ = np.array(meta["classes"])
+        self._token_pattern = re.compile(meta["token_pattern"])
+        self._lowercase = meta["lowercase"]
+        self._sublinear_tf = meta["sublinear_tf"]
+        self._norm = meta["norm"]
+        self._prob_mode = meta["prob_mode"]
+        self.term_hashes = term_hashes
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def exists(cls, model_dir):
+        return os.path.exists(os.path.join(model_dir, COMPACT_DIR, META_FILE))
+
+    @classmethod
+    def load(cls, model_dir, mmap=True):
+        """
+        :param model_dir: 模型产物目录
+        :param mmap: 是否以只读内存映射方式加载数组
+        """
+        compact_dir = os.path.join(model_dir, COMPACT_DIR)
+        with open(os.path.join(compact_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"不支持的紧凑模型格式版本: {meta.get('format_version')}")
+        mmap_mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(compact_dir, name + ".npy"), mmap_mode=mmap_mode) for name in ARRAY_FILES]
+        return cls(meta, *arrays)
+
+    def _features(self, text):
+        """返回 (词项行号数组, tf-idf 权重数组)"""
+        if self._lowercase:
+            text = text.lower()
+        counts = Counter(self._token_pattern.findall(text))
+        if not counts:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+        hashes = np.array([term_hash(term) for term in counts], dtype=np.uint64)
+        tf = np.array(list(counts.values()), dtype=np.float32)
+        rows = np.searchsorted(self.term_hashes, hashes)
+        rows = np.minimum(rows, len(self.term_hashes) - 1)
+        known = self.term_hashes[rows] == hashes
+        rows, tf = rows[known], tf[known]
+
+        if self._sublinear_tf:
+            tf = np.log(tf) + 1
+        weights = tf * self.idf[rows]
+        if self._norm == "l2":
+            norm = np.sqrt(np.dot(weights, weights))
+            if norm > 0:
+                weights = weights / norm
+        return rows, weights
+
+    def decision_function(self, texts):
+        scores = np.empty((len(texts), self.coef.shape[1]), dtype=np.float64)
+        for i, text in enumerate(texts):
+            rows, weights = self._features(text)
+            scores[i] = weights @ self.coef[rows] + self.intercept
+        return scores
+
+    def predict_proba(self, texts):
+        """
+        :param texts: 分词后以空格连接的文本列表（与训练时的输入一致）
+        :return: shape (n_texts, n_classes) 的概率矩阵，列顺序与 classes_ 一致
+        """
+        scores = self.decision_function(texts)
+        if self._prob_mode == "binary":
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - positive, positive])
+        if self._prob_mode == "ovr":
+            probs = 1.0 / (1.0 + np.exp(-scores))
+            return probs / probs.sum(axis=1, keepdims=True)
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        return probs / probs.sum(axis=1, keepdims=True)
@@ -0,0 +1,181 @@
+import math
+import re
+import threading
+from collections import namedtuple
+from collector.prompt_builder.config import COMPACTION_DROP_ORDER, COMPACTION_PROTECTED_PREFIXES
+from collector.prompt_builder.metrics import METRICS
+
+_TOKEN_PATTERN = re.compile(r"([\u3400-\u9fff\uf900-\ufaff])|([A-Za-z0-9_]+)|\S")
+_HEADER_MAX_LENGTH = 30
+# 取值为空的条目，如 "- 忌口要求：None"
+_EMPTY_ITEM = re.compile(r"^\s*-?\s*[^：:]+[：:]\s*(None|\[\]|)\s*$")
+
+CompactionResult = namedtuple("CompactionResult", ["text", "tokens_before", "tokens_after", "dropped_sections",
+                                                   "removed_lines"])
+
+
+def estimate_tokens(text):
+    """
+    本地快速估算 token 数：每个汉字约 1 个 token，连续的英文/数字约每 4 个字符 1 个 token，
+    其他非空白字符各 1 个 token
+    :param text: 文本
+    :return: 估算的 token 数
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for _, word in _TOKEN_PATTERN.findall(text):
+        tokens += math.ceil(len(word) / 4) if word else 1
+    return tokens
+
+
+class _Section:
+    __slots__ = ("title", "lines", "protected")
+
+    def __init__(self, title, lines, protected=False):
+        self.title = title
+        self.lines = lines
+        self.protected = protected
+
+
+def _is_header(line):
+    """以冒号结尾的短行；列表条目（"- " 开头，如取值为空的 "- 当前天气："）不是标题"""
+    stripped = line.strip()
+    return (stripped.endswith(("：", ":")) and len(stripped) <= _HEADER_MAX_LENGTH
+            and not stripped.startswith("-"))
+
+
+def split_sections(text, protected_prefixes=COMPACTION_PROTECTED_PREFIXES):
+    """
+    将去除空行后的提示词按段落标题（以冒号结尾的短行）切分
+    :return: list of _Section，标题前的零散行各自成段（title 为 None）
+    """
+    sections = []
+    current = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith(protected_prefixes):
+            current = _Section(None, [line], protected=True)
+            sections.append(current)
+            # 受保护的行以冒号结尾时（如角色说明），后面的条目也归入该段
+            if not _is_header(line):
+                current = None
+        elif _is_header(line):
+            current = _Section(stripped.rstrip("：:"), [line])
+            sections.append(current)
+        elif current is not None:
+            current.lines.append(line)
+        else:
+            sections.append(_Section(None, [line]))
+    return sections
+
+
+class PromptCompactor:
+    """
+    渲染后的提示词压缩：去除取值为空的条目、空段落和重复行，
+    超出 token 预算时再按 drop_order 依次删除低优先级段落；按模板统计压缩前后的 token 数
+    """
+
+    def __init__(self, token_budget=None, drop_order=None, estimator=estimate_tokens, metrics=None):
+        """
+        :param token_budget: token 预算，None 表示只做去空、去重，不删除段落
+        :param drop_order: 段落删除顺序，默认 COMPACTION_DROP_ORDER
+        :param estimator: token 估算函数 text -> int
+        :param metrics: MetricsRegistry，默认为进程级 METRICS
+        """
+        self.token_budget = token_budget
+        self.drop_order = list(COMPACTION_DROP_ORDER if drop_order is None else drop_order)
+        self.estimator = estimator
+        self.metrics = metrics or METRICS
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _clean_sections(self, sections):
+        """去除空条目、无内容的段落和重复行，返回被删除的行数"""
+        seen = set()
+        removed = 0
+        for section in sections:
+            kept = []
+            for index, line in enumerate(section.lines):
+                key = line.strip()
+                is_title = index == 0 and section.title is not None
+                if not section.protected and not is_title and _EMPTY_ITEM.match(line):
+                    removed += 1
+                    continue
+                # 只删除正文中的重复行，标题和受保护的行保持原样（但参与比较）
+                if not is_title:
+                    if key in seen and not section.protected:
+                        removed += 1
+                        continue
+                    seen.add(key)
+                kept.append(line)
+            section.lines = kept
+        non_empty = []
+        for section in sections:
+            if section.title is not None and not section.protected and len(section.lines) <= 1:
+                removed += len(section.lines)
+                continue
+            non_empty.append(section)
+        return non_empty, removed
+
+    @staticmethod
+    def _join(sections):
+        return "\n".join(line for section in sections for line in section.lines)
+
+    def compact(self, text, template_name=None, token_budget=None):
+        """
+        :param text: 已去除空行的提示词
+        :param template_name: 模板名，用于分模板统计
+        :param token_budget: 本次使用的预算，默认使用构造时的 token_budget
+        :return: CompactionResult
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        tokens_before = self.estimator(text)
+
+        sections, removed = self._clean_sections(split_sections(text))
+        compacted = self._join(sections)
+        tokens_after = self.estimator(compacted)
+
+        dropped = []
+        if budget is not None and tokens_after > budget:
+            for title in self.drop_order:
+                if tokens_after <= budget:
+                    break
+                remaining = [section for section in sections if section.protected or section.title != title]
+                if len(remaining) == len(sections):
+                    continue
+                sections = remaining
+                dropped.append(title)
+                compacted = self._join(sections)
+                tokens_after = self.estimator(compacted)
+
+        self._record(template_name, tokens_before, tokens_after)
+        return CompactionResult(compacted, tokens_before, tokens_after, dropped, removed)
+
+    def _record(self, template_name, tokens_before, tokens_after):
+        name = template_name or "unknown"
+        with self._lock:
+            stats = self._stats.setdefault(name, {"count": 0, "tokens_before": 0, "tokens_after": 0})
+            stats["count"] += 1
+            stats["tokens_before"] += tokens_before
+            stats["tokens_after"] += tokens_after
+        self.metrics.inc("prompt_tokens_before_total", tokens_before, template=name)
+        self.metrics.inc("prompt_tokens_after_total", tokens_after, template=name)
+
+    def report(self):
+        """
+        按模板统计压缩效果
+        :return: {模板名: {count, avg_tokens_before, avg_tokens_after, saved_ratio}}
+        """
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        report = {}
+        for name, values in sorted(stats.items()):
+            count, before, after = values["count"], values["tokens_before"], values["tokens_after"]
+            report[name] = {
+                "count": count,
+                "avg_tokens_before": before / count,
+                "avg_tokens_after": after / count,
+                "saved_ratio": 1 - after / before if before else 0.0,
+            }
+        return report
@@ -234,3 +234,28 @@ KEYWORD_WEIGHT_RULES = {
     }
 }
 
+
+# 级联意图识别阈值：规则得分为命中关键词个数，模型得分为概率加各项增强分
+CASCADE_THRESHOLDS = {
+    "rule_margin": 2,   # 规则第一、二名得分差达到该值时不再运行模型
+    "ml_margin": 0.2    # 模型第一、二名得分差达到该值时不再做句法分析
+}
+
+# 提示词压缩：超出 token 预算时按顺序删除的段落（以段落标题匹配，越靠前越先删除），未列出的段落不会删除
+COMPACTION_DROP_ORDER = [
+    "历史对话", "历史点单记录",
+    "建议场所配置", "推荐就餐环境", "推荐饮品搭配", "推荐搭配菜品",
+    "外部条件影响",
+    "推荐菜品风格", "推荐健康菜品"
+]
+
+# 以这些前缀开头的行（角色说明、用户请求、结尾指令）始终保留
+COMPACTION_PROTECTED_PREFIXES = ("你是一个", "当前用户请求", "请根据")
+
+# build_prompt_async 中外部查询的超时（秒），超时后使用默认值
+LOOKUP_TIMEOUTS = {
+    "weather": 0.5,
+    "order_history": 0.3,
+    "played_games": 0.3,
+    "user_profile": 0.3
+}
@@ -0,0 +1,175 @@
+import re
+from collections import defaultdict, namedtuple
+from difflib import SequenceMatcher
+from fuzzywuzzy import fuzz
+
+FuzzyMatch = namedtuple("FuzzyMatch", ["alias", "score", "start", "end"])
+
+_NON_WORD = re.compile(r"(?ui)\W")
+
+
+def _process(text):
+    """
+    与 fuzzywuzzy 的 full_process(force_ascii=True) 一致的归一化，
+    同时记录处理后每个字符在原文中的位置，便于回填 span
+    :return: (处理后的字符串, 位置映射列表)
+    """
+    chars, positions = [], []
+    for i, char in enumerate(text or ""):
+        if 128 <= ord(char) < 256:
+            continue
+        if _NON_WORD.match(char):
+            char = " "
+        for lowered in char.lower():
+            chars.append(lowered)
+            positions.append(i)
+
+    start, end = 0, len(chars)
+    while start < end and chars[start].isspace():
+        start += 1
+    while end > start and chars[end - 1].isspace():
+        end -= 1
+    return "".join(chars[start:end]), positions[start:end]
+
+
+def _grams(text, n):
+    """返回 {n-gram: [出现位置, ...]}"""
+    grams = defaultdict(list)
+    size = min(n, len(text))
+    for i in range(len(text) - size + 1):
+        grams[text[i:i + size]].append(i)
+    return grams
+
+
+class FuzzySlotIndex:
+    """
+    槽位别名的模糊匹配索引
+    按字符 n-gram 预先建立倒排索引，查询时只对与输入共享 n-gram 的候选别名打分，
+    且只在 n-gram 命中位置对齐的窗口上计算相似度（即 partial_ratio 的对齐方式），
+    得分口径与 fuzzywuzzy.process.extractOne 的默认 WRatio 保持一致
+    """
+
+    def __init__(self, slot_dict, n=2):
+        """
+        :param slot_dict: {槽位名: [别名, ...]}
+        :param n: n-gram 长度
+        """
+        self.n = n
+        self._aliases = []  # (槽位名, 原始别名, 处理后别名, {gram: [偏移]})
+        self._index = defaultdict(list)  # gram -> [别名序号]
+        self._unigram_index = defaultdict(list)  # 输入短于 n 时使用
+        for slot_name, keywords in slot_dict.items():
+            for keyword in keywords:
+                processed, _ = _process(keyword)
+                if not processed:
+                    continue
+                alias_id = len(self._aliases)
+                grams = _grams(processed, n)
+                self._aliases.append((slot_name, keyword, processed, grams))
+                for gram in grams:
+                    self._index[gram].append(alias_id)
+                for char in set(processed):
+                    self._unigram_index[char].append(alias_id)
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def _candidates(self, processed, text_grams, slot_names):
+        """返回与输入共享 n-gram 的候选别名序号（按词表顺序）"""
+        if len(processed) < self.n:
+            index, keys = self._unigram_index, set(processed)
+        else:
+            index, keys = self._index, text_grams.keys()
+
+        candidates = set()
+        for gram in keys:
+            for alias_id in index.get(gram, ()):
+                if slot_names is None or self._aliases[alias_id][0] in slot_names:
+                    candidates.add(alias_id)
+        return sorted(candidates)
+
+    def _score(self, processed, alias_id, threshold, memo):
+        """
+        计算输入与单个别名的得分
+        :return: (得分, 命中窗口在处理后文本中的起止位置)
+        """
+        _, _, alias, alias_grams = self._aliases[alias_id]
+        key = (processed, alias_id, threshold)
+        if memo is not None and key in memo:
+            return memo[key]
+
+        len_ratio = max(len(processed), len(alias)) / min(len(processed), len(alias))
+        if len_ratio < 1.5:
+            # 长度相近时直接使用完整 WRatio，代价很低
+            result = (fuzz.WRatio(processed, alias, full_process=False), 0, len(processed))
+        else:
+            partial_scale = 0.6 if len_ratio > 8 else 0.9
+            text_is_longer = len(processed) > len(alias)
+            shorter, longer = (alias, processed) if text_is_longer else (processed, alias)
+
+            best_ratio, best_start = 0.0, 0
+            seen = set()
+            size = min(self.n, len(shorter))
+            for i in range(len(longer) - size + 1):
+                gram = longer[i:i + size]
+                offsets = alias_grams.get(gram) if text_is_longer else None
+                if not text_is_longer:
+                    offsets = [j for j in range(len(shorter) - size + 1) if shorter[j:j + size] == gram]
+                for offset in offsets or ():
+                    start = max(i - offset, 0)
+                    if start in seen:
+                        continue
+                    seen.add(start)
+                    ratio = SequenceMatcher(None, shorter, longer[start:start + len(shorter)]).ratio()
+                    if ratio > best_ratio:
+                        best_ratio, best_start = ratio, start
+
+            partial = 100 if best_ratio > .995 else int(round(100 * best_ratio))
+            score = int(round(partial * partial_scale))
+            if text_is_longer:
+                result = (score, best_start, min(best_start + len(alias), len(processed)))
+            else:
+                result = (score, 0, len(processed))
+
+            # 整体 ratio 的上界为 200 / (1 + len_ratio)，只有可能过阈值时才计算
+            if score < threshold <= 200 / (1 + len_ratio):
+                base = fuzz.ratio(processed, alias)
+                if base > score:
+                    result = (base, 0, len(processed))
+
+        if memo is not None:
+            memo[key] = result
+        return result
+
+    def match(self, text, threshold=80, slot_names=None, _memo=None):
+        """
+        对单条文本做模糊匹配
+        :param text: 输入文本
+        :param threshold: 得分阈值，得分不低于阈值才算命中
+        :param slot_names: 只匹配这些槽位（默认全部）
+        :return: {槽位名: FuzzyMatch}，span 为原文中的字符区间
+        """
+        processed, positions = _process(text)
+        if not processed:
+            return {}
+        text_grams = _grams(processed, self.n)
+        slot_names = set(slot_names) if slot_names is not None else None
+
+        best = {}
+        for alias_id in self._candidates(processed, text_grams, slot_names):
+            slot_name, keyword = self._aliases[alias_id][:2]
+            score, start, end = self._score(processed, alias_id, threshold, _memo)
+            if score < threshold:
+                continue
+            if slot_name not in best or score > best[slot_name].score:
+                best[slot_name] = FuzzyMatch(keyword, score, positions[start], positions[end - 1] + 1)
+        return best
+
+    def match_batch(self, texts, threshold=80, slot_names=None):
+        """
+        批量模糊匹配，相同的 (文本, 别名) 组合在一批内只打分一次
+        :param texts: 文本列表
+        :return: 与输入一一对应的 {槽位名: FuzzyMatch} 列表
+        """
+        memo = {}
+        return [self.match(text, threshold, slot_names, _memo=memo) for text in texts]
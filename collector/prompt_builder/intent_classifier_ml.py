@@ -1,18 +1,66 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
-import jieba
 import json
-from ltp import LTP
+import os
+import time
 from collections import defaultdict
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
-ltp = LTP()
-
+from collector.prompt_builder.analysis import as_text, ensure_analysis, find_hits
+from collector.prompt_builder.cache import LRUCache, classification_key
 from collector.prompt_builder.config import INTENT_KEYWORDS, KEYWORD_WEIGHT_RULES
+from collector.prompt_builder.lexicon import KeywordAutomaton
+from collector.prompt_builder.batching import BatchQueueFull, MicroBatcher
+from collector.prompt_builder.lazy import JIEBA, LTP_MODEL
+from collector.prompt_builder.metrics import METRICS
+from collector.prompt_builder.model_store import (
+    file_sha256, save_artifact, load_artifact, read_manifest, is_compatible
+)
+
+ML_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml_data")
+DEFAULT_DATA_PATH = os.path.join(ML_DATA_DIR, "intent_data.json")
+DEFAULT_MODEL_DIR = os.path.join(ML_DATA_DIR, "model")
+
+INTENT_KEYWORD_AUTOMATON = KeywordAutomaton(
+    (keyword, intent) for intent, keywords in INTENT_KEYWORDS.items() for keyword in keywords
+)
 
 
 class IntentClassifierML:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, data_path=None, syntax_batching=False,
+                 batch_window_ms=5, max_batch_size=16, max_pending=256, syntax_timeout=2.0,
+                 cache_size=0, compact=False, debug=False, metrics=None):
+        """
+        :param model_path: 模型产物目录，默认 ml_data/model
+        :param data_path: 训练数据路径，默认 ml_data/intent_data.json
+        :param syntax_batching: 是否通过后台微批线程合并并发的句法分析请求
+        :param batch_window_ms: 微批凑批时间窗口（毫秒）
+        :param max_batch_size: 微批最大条数
+        :param max_pending: 等待队列上限，超过时拒绝新请求
+        :param syntax_timeout: 单个句法分析请求的超时（秒）
+        :param cache_size: 分类结果缓存条数，0 表示不启用缓存
+        :param compact: 是否加载内存映射的紧凑模型（多 worker 共享内存，推理不依赖 scikit-learn）
+        :param debug: 是否在每次分类时打印全部意图得分
+        :param metrics: 缓存命中与句法降级统计使用的 MetricsRegistry，默认为进程级 METRICS
+        """
+        self.model_path = model_path or DEFAULT_MODEL_DIR
+        self.data_path = data_path or DEFAULT_DATA_PATH
+        self.manifest = None
+        self._model = None
+        self.compact = compact
+        self.compact_model = None
+        self.debug = debug
+        self.metrics = metrics or METRICS
+        self._cache = LRUCache(cache_size, name="intent_ml", metrics=self.metrics) if cache_size else None
+        self._generation = 0
+        self._syntax_batcher = None
+        if syntax_batching:
+            self._syntax_batcher = MicroBatcher(
+                self.analyze_syntax_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=batch_window_ms,
+                max_queue_size=max_pending,
+                timeout=syntax_timeout,
+                name="ltp-syntax-batcher"
+            )
         self.intents = [
             "order", "game_recommendation", "healthy_diet",
             "festival", "vegetarian", "child_or_elderly",
@@ -20,47 +68,303 @@ class IntentClassifierML:
             "fitness_nutrition", "holiday_event", "group_gathering",
             "takeaway_service", "allergy_safe", "nutritional_info"
         ]
-        self.model = self._build_pipeline()
         self.is_trained = False
 
+    @property
+    def model(self):
+        # scikit-learn 只在真正需要训练或推理时才导入
+        if self._model is None:
+            self._model = self._build_pipeline()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
 
     def _build_pipeline(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
         return Pipeline([
             ('tfidf', TfidfVectorizer()),
             ('clf', LogisticRegression())
         ])
 
+    def _tokenize(self, text):
+        return list(JIEBA.get().cut(text))
+
     def _chinese_tokenize(self, text):
-        return ' '.join(jieba.cut(text))
+        return ' '.join(self._tokenize(text))
+
+    def warmup(self, syntax=True):
+        """
+        预加载模型，部署时在接收流量前调用，避免首个请求承担加载耗时
+        :param syntax: 是否同时加载 LTP 句法分析模型
+        """
+        if not self.is_trained:
+            self.load_or_train()
+        self._chinese_tokenize("预热")
+        if syntax:
+            LTP_MODEL.get()
 
     def train(self):
-        with open("E:\\work\\waiter\\collector\\prompt_builder\\ml_data\intent_data.json", "r", encoding="utf-8") as f:
+        with open(self.data_path, "r", encoding="utf-8") as f:
             data = json.load(f)
         texts = [item["text"] for item in data]
         labels = [item["intent"] for item in data]
         processed_texts = [self._chinese_tokenize(t) for t in texts]
         self.model.fit(processed_texts, labels)
         self.is_trained = True
+        self.manifest = None
+        self.compact_model = None
+        self._invalidate_cache()
+
+    def save(self):
+        """将训练好的模型连同 manifest 保存到 model_path"""
+        if not self.is_trained:
+            raise Exception("模型未训练，请先调用 train() 方法")
+        if self._model is None:
+            raise Exception("当前加载的是紧凑模型，请先调用 train() 后再保存")
+        from collector.prompt_builder.compact_model import export_compact_model
+        labels = self.model.named_steps['clf'].classes_.tolist()
+        export_compact_model(self.model, self.model_path)
+        self.manifest = save_artifact(self.model, self.model_path, file_sha256(self.data_path), labels)
+        return self.manifest
+
+    def load(self, check_data=True):
+        """
+        从 model_path 加载模型产物
+        :param check_data: 是否要求产物与当前训练数据的哈希一致
+        :return: 是否加载成功
+        """
+        data_hash = file_sha256(self.data_path) if check_data else None
+        if self.compact and self._load_compact(data_hash):
+            return True
+        artifact = load_artifact(self.model_path, data_hash)
+        if artifact is None:
+            return False
+        self.model, self.manifest = artifact
+        self.compact_model = None
+        self.is_trained = True
+        self._invalidate_cache()
+        if self.compact:
+            self._export_missing_compact()
+        return True
+
+    def _load_compact(self, data_hash):
+        from collector.prompt_builder.compact_model import CompactIntentModel
+        manifest = read_manifest(self.model_path)
+        if not is_compatible(manifest, data_hash, check_library=False):
+            return False
+        if not CompactIntentModel.exists(self.model_path):
+            return False
+        try:
+            self.compact_model = CompactIntentModel.load(self.model_path)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] 紧凑模型加载失败，改为加载 joblib 模型: {e}")
+            return False
+        self.manifest = manifest
+        self.is_trained = True
+        self._invalidate_cache()
+        return True
+
+    def _export_missing_compact(self):
+        """
+        旧版本产物没有 compact/ 目录（或紧凑格式版本不符）时，用刚加载的 joblib 模型补导出并改用紧凑模型；
+        导出失败时继续使用 joblib 模型
+        """
+        from collector.prompt_builder.compact_model import CompactIntentModel, export_compact_model
+        try:
+            export_compact_model(self.model, self.model_path)
+            self.compact_model = CompactIntentModel.load(self.model_path)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] 紧凑模型导出失败，继续使用 joblib 模型: {e}")
+            self.compact_model = None
+            return False
+        print(f"[INFO] 已为 {self.model_path} 补导出紧凑模型")
+        return True
+
+    def _predict_proba(self, processed_texts):
+        """返回 (概率矩阵, 类别数组)，优先使用紧凑模型"""
+        if self.compact_model is not None:
+            return self.compact_model.predict_proba(processed_texts), self.compact_model.classes_
+        return self.model.predict_proba(processed_texts), self.model.named_steps['clf'].classes_
+
+    def load_or_train(self):
+        """优先加载已有产物，训练数据变化或产物不兼容时重新训练并保存"""
+        if self.load():
+            return
+        self.train()
+        try:
+            self.save()
+        except OSError as e:
+            print(f"[WARNING] 模型产物保存失败: {e}")
+
+    def _invalidate_cache(self):
+        """模型重新训练或加载后，旧的缓存结果全部失效"""
+        self._generation += 1
+        if self._cache is not None:
+            self._cache.clear()
+
+    def cache_stats(self):
+        """分类缓存的命中统计，未启用缓存时返回 None"""
+        return self._cache.stats() if self._cache is not None else None
+
+    @property
+    def model_version(self):
+        """模型版本：训练数据哈希的前 12 位，未持久化时为 None"""
+        if self.manifest:
+            return self.manifest["data_sha256"][:12]
+        return None
 
     def classify(self, text, slots=None):
+        sorted_intents = self.classify_batch([text], [slots])[0]
+
+        # 打印所有意图及得分（调试用）
+        if self.debug:
+            print("【意图识别结果】")
+            for intent, score in sorted_intents:
+                print(f"{intent}: {score:.4f}")
+
+        # 返回得分最高的意图
+        if sorted_intents:
+            best_intent, best_score = sorted_intents[0]
+            return best_intent
+        else:
+            return "enhanced_basic_with_all"
+
+    def classify_batch(self, texts, slots_list=None, use_syntax=True):
+        """
+        批量意图识别：分词后一次向量化与预测，一次 LTP 调用完成全部句法分析
+        :param texts: 文本或 TextAnalysis 列表（后者复用已有的分词、关键词与句法结果）
+        :param slots_list: 与 texts 一一对应的槽位字典列表（可选）
+        :param use_syntax: 是否叠加句法分析增强（关闭时不会加载 LTP）
+        :return: 每条输入的 [(intent, score), ...]，按得分降序
+        """
         if not self.is_trained:
             raise Exception("模型未训练，请先调用 train() 方法")
+        texts = list(texts)
+        if not texts:
+            return []
+        slots_list = list(slots_list) if slots_list is not None else [None] * len(texts)
+        if len(slots_list) != len(texts):
+            raise ValueError("slots_list 与 texts 长度不一致")
+
+        results = [None] * len(texts)
+        keys = [None] * len(texts)
+        if self._cache is not None:
+            version = (self._generation, self.model_version, use_syntax)
+            for i, (text, slots) in enumerate(zip(texts, slots_list)):
+                keys[i] = classification_key(as_text(text), slots, version)
+                cached = self._cache.get(keys[i])
+                if cached is not None:
+                    results[i] = list(cached)
+
+        # 只对未命中缓存的输入做推理
+        todo = [i for i, result in enumerate(results) if result is None]
+        if todo:
+            computed, degraded = self._classify_uncached(
+                [texts[i] for i in todo], [slots_list[i] for i in todo], use_syntax
+            )
+            for i, ranked, skipped_syntax in zip(todo, computed, degraded):
+                results[i] = ranked
+                # 句法分析降级的结果不缓存，避免之后一直使用缺少句法增强的得分
+                if keys[i] is not None and not skipped_syntax:
+                    self._cache.put(keys[i], tuple(ranked))
+        return results
+
+    def _classify_uncached(self, texts, slots_list, use_syntax=True):
+        """
+        :return: (每条输入的排序结果, 每条输入是否因句法分析降级而未使用句法增强)
+        """
+        analyses = [ensure_analysis(text, self._tokenize) for text in texts]
+        probs_batch, classes = self._predict_proba([analysis.tokenized_text for analysis in analyses])
+        syntax_results = self._load_syntax(analyses) if use_syntax else [None] * len(analyses)
+
+        results = []
+        degraded = []
+        for analysis, slots, probs, syntax_result in zip(analyses, slots_list, probs_batch, syntax_results):
+            intent_scores = self._score_intents(analysis, classes, probs, syntax_result, slots)
+            results.append(sorted(intent_scores.items(), key=lambda x: x[1], reverse=True))
+            degraded.append(use_syntax and syntax_result is None)
+        return results, degraded
+
+    def _syntax_or_none(self, analysis):
+        """
+        取句法分析结果；微批队列已满或等待超时时返回 None，由调用方跳过句法增强
+        """
+        try:
+            return analysis.syntax(self.analyze_syntax)
+        except (BatchQueueFull, FuturesTimeoutError) as e:
+            self._record_syntax_fallback(e)
+            return None
+
+    def _record_syntax_fallback(self, error):
+        reason = "queue_full" if isinstance(error, BatchQueueFull) else "timeout"
+        print(f"[WARNING] 句法分析降级（{reason}），本次不使用句法增强")
+        self.metrics.inc("syntax_fallbacks_total", reason=reason)
+
+    def _load_syntax(self, analyses):
+        """
+        为尚未做句法分析的输入补齐结果：开启微批时逐条提交给微批器，与并发请求合并且受队列上限和超时约束；
+        否则合并为一次 LTP 调用
+        :return: 与 analyses 一一对应的句法结果，降级的输入为 None
+        """
+        pending = [analysis for analysis in analyses if not analysis.syntax_loaded]
+        if pending and self._syntax_batcher is not None:
+            self._load_syntax_batched(pending)
+        elif pending:
+            syntax_batch = self.analyze_syntax_batch([analysis.text for analysis in pending])
+            for analysis, syntax_result in zip(pending, syntax_batch):
+                analysis.store_syntax(syntax_result)
+        return [analysis.syntax(self.analyze_syntax) if analysis.syntax_loaded else None for analysis in analyses]
 
-        processed_text = self._chinese_tokenize(text)
+    def _load_syntax_batched(self, pending):
+        """全部提交后再统一等待，整批共用一个超时；队列已满或超时的输入保持未分析状态"""
+        submitted = []
+        for analysis in pending:
+            try:
+                submitted.append((analysis, self._syntax_batcher.submit(analysis.text)))
+            except BatchQueueFull as e:
+                self._record_syntax_fallback(e)
+        timeout = self._syntax_batcher.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for analysis, future in submitted:
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                analysis.store_syntax(future.result(timeout=remaining))
+            except FuturesTimeoutError as e:
+                # 超时后取消，后台线程不会再处理该请求
+                future.cancel()
+                self._record_syntax_fallback(e)
 
-        probs = self.model.predict_proba([processed_text])[0]
-        classes = self.model.named_steps['clf'].classes_
+    def apply_syntax(self, text, ranked):
+        """
+        在不含句法增强的排序结果上叠加句法分析得分（得分各项可加，与一次性计算结果一致）
+        :param text: 文本或 TextAnalysis
+        :param ranked: classify_batch(..., use_syntax=False) 的单条结果
+        :return: 重新排序后的 [(intent, score), ...]；句法分析降级时按原得分排序
+        """
+        analysis = ensure_analysis(text, self._tokenize)
+        intent_scores = defaultdict(float, ranked)
+        syntax_result = self._syntax_or_none(analysis)
+        if syntax_result is not None:
+            intent_scores = self.enhance_intent_scores_with_syntax(analysis.text, intent_scores, syntax_result)
+        return sorted(intent_scores.items(), key=lambda x: x[1], reverse=True)
 
+    def _score_intents(self, analysis, classes, probs, syntax_result, slots=None):
+        """合并模型概率、关键词、句法与槽位信息，得到单条输入的意图得分"""
         intent_scores = defaultdict(float)
         for cls, prob in zip(classes, probs):
             intent_scores[cls] = prob
 
-        keyword_intents = self.extract_intents_from_keywords(text)
+        keyword_intents = self.extract_intents_from_keywords(analysis)
         for intent in keyword_intents:
             intent_scores[intent] += 0.5
 
         # 新增：语法结构增强
-        intent_scores = self.enhance_intent_scores_with_syntax(text, intent_scores)
+        if syntax_result is not None:
+            intent_scores = self.enhance_intent_scores_with_syntax(analysis.text, intent_scores, syntax_result)
 
         # 槽位增强
         if slots:
@@ -72,37 +376,25 @@ class IntentClassifierML:
                     intent_scores["fitness_nutrition"] += 0.3
                 elif health_pref == "无糖":
                     intent_scores["intermittent_fasting"] += 0.3
+        return intent_scores
 
-        # 排序并输出所有意图
-        sorted_intents = sorted(intent_scores.items(), key=lambda x: x[1], reverse=True)
-
-        # 打印所有意图及得分（可选）
-        print("【意图识别结果】")
-        for intent, score in sorted_intents:
-            print(f"{intent}: {score:.4f}")
-
-        # 返回得分最高的意图
-        if sorted_intents:
-            best_intent, best_score = sorted_intents[0]
-            return best_intent
-        else:
-            return "enhanced_basic_with_all"
     def extract_intents_from_keywords(self, text):
-        matched_intents = []
-        for intent, keywords in INTENT_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in text:
-                    matched_intents.append(intent)
-                    break
-        return list(set(matched_intents))
-    def enhance_intent_scores_with_syntax(self, text, intent_scores):
+        """
+        :param text: 用户输入文本或 TextAnalysis
+        :return: 命中关键词的意图列表
+        """
+        return list({intent for _, _, _, intent in find_hits(text, INTENT_KEYWORD_AUTOMATON)})
+
+    def enhance_intent_scores_with_syntax(self, text, intent_scores, syntax_result=None):
         """
         使用句法分析增强意图得分
         :param text: 用户输入文本
         :param intent_scores: 当前意图得分字典
+        :param syntax_result: 已有的句法分析结果（可选，缺省时现场分析）
         :return: 更新后的意图得分
         """
-        syntax_result = self.analyze_syntax(text)
+        if syntax_result is None:
+            syntax_result = self.analyze_syntax(text)
 
         for word, postag, arc in syntax_result:
             head_idx = arc["head"] - 1  # 依存关系头索引（从1开始）
@@ -119,15 +411,29 @@ class IntentClassifierML:
         """
         使用 LTP 4.x 分析中文句法结构
         :param text: 输入文本
-        :return: list of (word, postag, head, relation)
+        :return: list of (word, postag, arc)
         """
-    # 调用 pipeline 执行分词、词性标注、依存句法分析
-        output = ltp.pipeline([text], tasks=["cws", "pos", "dep"], raw_format=True)
+        if self._syntax_batcher is not None:
+            # 与其他请求线程合并为一次批量调用
+            return self._syntax_batcher.process(text)
+        return self.analyze_syntax_batch([text])[0]
 
-        words = output.cws[0]
-        postags = output.pos[0]
-        deps = output.dep[0]
+    def analyze_syntax_batch(self, texts):
+        """
+        一次 LTP 调用分析多条文本
+        :param texts: 文本列表
+        :return: 与输入一一对应的 [(word, postag, arc), ...] 列表
+        """
+        if not texts:
+            return []
+        # 调用 pipeline 执行分词、词性标注、依存句法分析
+        output = LTP_MODEL.get().pipeline(list(texts), tasks=["cws", "pos", "dep"], raw_format=True)
+        return [
+            self._parse_syntax(words, postags, deps)
+            for words, postags, deps in zip(output.cws, output.pos, output.dep)
+        ]
 
+    def _parse_syntax(self, words, postags, deps):
         # 构建依存关系结构
         arcs = []
         for i, rel in enumerate(deps):
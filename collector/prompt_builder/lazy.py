@@ -0,0 +1,54 @@
+import threading
+
+
+class LazyResource:
+    """
+    线程安全的延迟初始化容器
+    第一次调用 get() 时才执行工厂函数，多线程并发首次访问时只初始化一次
+    """
+
+    def __init__(self, factory, name=None):
+        """
+        :param factory: 无参工厂函数，返回要缓存的资源
+        :param name: 资源名称（用于日志）
+        """
+        self._factory = factory
+        self.name = name or getattr(factory, "__name__", "resource")
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                self._value = self._factory()
+                self._loaded = True
+        return self._value
+
+    def reset(self):
+        """丢弃已创建的资源，下次 get() 时重新创建"""
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+def _create_jieba():
+    import jieba
+    jieba.initialize()
+    return jieba
+
+
+def _create_ltp():
+    from ltp import LTP
+    return LTP()
+
+
+# 进程内共享的重量级模型，首次使用时才加载
+JIEBA = LazyResource(_create_jieba, name="jieba")
+LTP_MODEL = LazyResource(_create_ltp, name="ltp")
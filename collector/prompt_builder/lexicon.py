@@ -0,0 +1,82 @@
+from collections import deque
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 多模式匹配自动机
+    构建一次后，单次线性扫描文本即可返回所有关键词命中及其位置，
+    匹配耗时只与文本长度和命中数量相关，与词表大小无关
+    """
+
+    def __init__(self, keywords=None):
+        """
+        :param keywords: 可迭代的 (关键词, 附带数据) 对
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._size = 0
+        if keywords:
+            for keyword, payload in keywords:
+                self._add(keyword, payload)
+        self._build()
+
+    def __len__(self):
+        return self._size
+
+    def _add(self, keyword, payload):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((keyword, payload))
+        self._size += 1
+
+    def _build(self):
+        """按层次遍历构建失败指针，并合并后缀状态的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                if self._output[self._fail[nxt]]:
+                    self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def iter_matches(self, text):
+        """
+        单次扫描文本，依次产出所有命中
+        :param text: 输入文本
+        :return: 生成 (start, end, keyword, payload)，end 为开区间
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword, payload in output[state]:
+                yield i + 1 - len(keyword), i + 1, keyword, payload
+
+    def find_all(self, text):
+        """返回所有命中的列表"""
+        if not text:
+            return []
+        return list(self.iter_matches(text))
+
+    def contains_any(self, text):
+        """文本中是否至少包含一个关键词"""
+        for _ in self.iter_matches(text or ""):
+            return True
+        return False
@@ -0,0 +1,161 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                    for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _quantile(sorted_values, q):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return math.nan
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Histogram:
+    """
+    耗时分布：保留最近 window 个样本的环形缓冲区用于计算分位数，
+    另外累计全部样本的次数与总和
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._samples = [0.0] * window
+        self._next = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % self.window
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, qs=QUANTILES):
+        size = min(self.count, self.window)
+        values = sorted(self._samples[:size])
+        return {q: _quantile(values, q) for q in qs}
+
+
+class MetricsRegistry:
+    """
+    进程内的轻量指标：分阶段耗时直方图与计数器，可导出为 Prometheus 文本格式
+    """
+
+    def __init__(self, prefix="waiter", window=2048):
+        """
+        :param prefix: 指标名前缀
+        :param window: 每个直方图保留用于计算分位数的样本数
+        """
+        self.prefix = prefix
+        self.window = window
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = defaultdict(float)
+
+    def observe(self, stage, seconds):
+        """记录某个阶段的一次耗时（秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.window)
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        """
+        计数器加一（或加 value）
+        :param name: 计数器名，如 cache_hits_total
+        :param labels: 标签，如 cache="intent_ml"
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        统计 with 块耗时；块内抛出异常时同时计入 errors_total{stage=...}
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("errors_total", stage=stage)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def snapshot(self):
+        """
+        :return: {"stages": {stage: {count, sum, p50, p95, p99}}, "counters": {(name, labels): value}}
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in self._histograms.items():
+                quantiles = histogram.quantiles()
+                stages[stage] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    **{f"p{int(q * 100)}": value for q, value in quantiles.items()},
+                }
+            return {"stages": stages, "counters": dict(self._counters)}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self):
+        """导出 Prometheus 文本格式（耗时以 summary 形式给出，单位秒）"""
+        snapshot = self.snapshot()
+        lines = []
+
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Prompt pipeline stage latency in seconds.")
+        lines.append(f"# TYPE {name} summary")
+        for stage, stats in sorted(snapshot["stages"].items()):
+            stage_key = (("stage", stage),)
+            for q in QUANTILES:
+                value = stats[f"p{int(q * 100)}"]
+                lines.append(f"{name}{_format_labels(stage_key, [('quantile', q)])} {value!r}")
+            lines.append(f"{name}_sum{_format_labels(stage_key)} {stats['sum']!r}")
+            lines.append(f"{name}_count{_format_labels(stage_key)} {stats['count']}")
+
+        by_name = defaultdict(list)
+        for (counter_name, label_key), value in snapshot["counters"].items():
+            by_name[counter_name].append((label_key, value))
+        for counter_name in sorted(by_name):
+            full_name = f"{self.prefix}_{counter_name}"
+            lines.append(f"# TYPE {full_name} counter")
+            for label_key, value in sorted(by_name[counter_name]):
+                value = int(value) if float(value).is_integer() else value
+                lines.append(f"{full_name}{_format_labels(label_key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程级默认指标注册表
+METRICS = MetricsRegistry()
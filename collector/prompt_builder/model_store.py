@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import platform
+import tempfile
+import time
+
+# 产物格式版本，修改存储结构时递增
+ARTIFACT_FORMAT_VERSION = 1
+MODEL_FILE = "model.joblib"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path):
+    """计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def library_versions():
+    """记录影响模型序列化兼容性的依赖版本"""
+    versions = {"python": platform.python_version()}
+    for name, module_name in (("scikit-learn", "sklearn"), ("numpy", "numpy"),
+                              ("jieba", "jieba"), ("joblib", "joblib")):
+        try:
+            module = __import__(module_name)
+            versions[name] = getattr(module, "__version__", "unknown")
+        except ImportError:
+            versions[name] = None
+    return versions
+
+
+def _atomic_write(path, write):
+    """先写临时文件再替换，避免其他进程读到半写入的产物"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_artifact(model, model_dir, data_hash, labels):
+    """
+    保存训练好的模型及其 manifest
+    :param model: 训练好的 sklearn Pipeline
+    :param model_dir: 产物目录
+    :param data_hash: 训练数据的 sha256
+    :param labels: 标签集合
+    :return: manifest 字典
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "data_sha256": data_hash,
+        "labels": sorted(labels),
+        "library_versions": library_versions(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    import joblib
+
+    # 先写模型再写 manifest，manifest 存在即表示产物完整
+    _atomic_write(os.path.join(model_dir, MODEL_FILE), lambda p: joblib.dump(model, p))
+
+    def write_manifest(p):
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    _atomic_write(os.path.join(model_dir, MANIFEST_FILE), write_manifest)
+    return manifest
+
+
+def read_manifest(model_dir):
+    """读取 manifest，不存在或损坏时返回 None"""
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_compatible(manifest, data_hash=None, check_library=True):
+    """
+    判断产物能否直接使用：格式版本、训练数据和 scikit-learn 版本都需一致
+    :param manifest: read_manifest 的结果
+    :param data_hash: 当前训练数据的 sha256（None 表示不校验）
+    :param check_library: 是否校验 scikit-learn 版本（紧凑格式不依赖 pickle，可跳过）
+    """
+    if not manifest or manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        return False
+    if data_hash is not None and manifest.get("data_sha256") != data_hash:
+        return False
+    if not check_library:
+        return True
+    saved_sklearn = manifest.get("library_versions", {}).get("scikit-learn")
+    return saved_sklearn == library_versions()["scikit-learn"]
+
+
+def load_artifact(model_dir, data_hash=None):
+    """
+    加载模型产物
+    :param model_dir: 产物目录
+    :param data_hash: 当前训练数据的 sha256，不一致时视为过期
+    :return: (model, manifest)；不存在、过期或不兼容时返回 None
+    """
+    manifest = read_manifest(model_dir)
+    if not is_compatible(manifest, data_hash):
+        return None
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    if not os.path.exists(model_path):
+        return None
+    import joblib
+    return joblib.load(model_path), manifest
@@ -1,8 +1,31 @@
 # collector/nlu/intent_classifier.py
+from collections import defaultdict
+from collector.prompt_builder.analysis import as_text, find_hits
+from collector.prompt_builder.cache import LRUCache, classification_key
+from collector.prompt_builder.lexicon import KeywordAutomaton
+
+# 得分相同时的优先级，未列出的意图按规则定义顺序排在后面
+PRIORITY_ORDER = [
+    "festival", "game_recommendation",
+    "weight_loss", "intermittent_fasting",
+    "healthy_diet", "vegetarian",
+    "seasonal_food", "child_or_elderly",
+    "order"
+]
+
 
 class IntentClassifier:
-    def __init__(self):
-        self.intent_rules = {
+    def __init__(self, intent_rules=None, priority_order=None, cache_size=0, metrics=None):
+        """
+        :param intent_rules: {意图: [关键词, ...]}，默认使用内置规则
+        :param priority_order: 得分相同时的意图优先级
+        :param cache_size: 分类结果缓存条数，0 表示不启用缓存
+        :param metrics: 缓存命中统计使用的 MetricsRegistry，默认为进程级 METRICS
+        """
+        self.priority_order = priority_order or PRIORITY_ORDER
+        self.rules_version = 0
+        self._cache = LRUCache(cache_size, name="intent_rule", metrics=metrics) if cache_size else None
+        self.intent_rules = intent_rules or {
             "order": [
                 "下单", "点菜", "订位", "订桌", "订好了", "订过",
                 "订座", "订餐", "点了", "选好了", "确定了"
@@ -55,49 +78,106 @@ class IntentClassifier:
                 "多少卡", "热量标注", "营养表", "健康值"
             ]
         }
+        self._compile()
+
+    def _compile(self):
+        """
+        将 intent_rules 编译为 关键词 -> 意图 的自动机，并预先计算平局时的优先级
+        """
+        self._automaton = KeywordAutomaton(
+            (keyword, (intent, index))
+            for intent, keywords in self.intent_rules.items()
+            for index, keyword in enumerate(keywords)
+        )
+        intents = list(self.intent_rules)
+        self._rank = {
+            intent: (self.priority_order.index(intent) if intent in self.priority_order
+                     else len(self.priority_order) + position)
+            for position, intent in enumerate(intents)
+        }
+        self._ranked_intents = sorted(intents, key=self._rank.get)
 
+        # 规则变化后旧的缓存结果全部失效
+        self.rules_version += 1
+        if self._cache is not None:
+            self._cache.clear()
 
+    def reload_rules(self, intent_rules):
+        """替换关键词规则并重新编译"""
+        self.intent_rules = intent_rules
+        self._compile()
 
-    def classify(self, text, slots=None):
-        scores = {}
+    def _keyword_scores(self, text):
+        """单次扫描文本，每个意图的得分为命中的不同关键词个数"""
+        matched = {payload for _, _, _, payload in find_hits(text, self._automaton)}
+        scores = defaultdict(int)
+        for intent, _ in matched:
+            scores[intent] += 1
+        return scores
+
+    def _apply_slot_boosts(self, scores, slots):
+        """结合槽位信息增强判断"""
+        def boost(intent, value):
+            if intent in self._rank:
+                scores[intent] += value
 
-        for intent, keywords in self.intent_rules.items():
-            score = sum(1 for word in keywords if word in text)
-            scores[intent] = score
+        if "健康偏好" in slots:
+            health_pref = slots["健康偏好"]
+            if health_pref == "低脂":
+                boost("weight_loss", 3)
+            elif health_pref == "无糖":
+                boost("intermittent_fasting", 3)
+        if "特殊节日" in slots:
+            boost("festival", 2)
+        if "天气状态" in slots:
+            weather = slots["天气状态"]
+            if weather in ["寒冷", "阴雨"]:
+                boost("weather_based", 2)
+            elif weather in ["炎热", "晴朗"]:
+                boost("seasonal_food", 2)
 
-        # 结合槽位信息增强判断
+    def _scored_intents(self, text, slots):
+        """得分非零的意图排序结果，启用缓存时按 (归一化文本, 槽位, 规则版本) 缓存"""
+        key = None
+        if self._cache is not None:
+            key = classification_key(as_text(text), slots, self.rules_version)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+        scores = self._keyword_scores(text)
         if slots:
-            if "健康偏好" in slots:
-                health_pref = slots["健康偏好"]
-                if health_pref == "低脂":
-                    scores["weight_loss"] += 3
-                elif health_pref == "无糖":
-                    scores["intermittent_fasting"] += 3
-            if "特殊节日" in slots:
-                scores["festival"] += 2
-            if "天气状态" in slots:
-                weather = slots["天气状态"]
-                if weather in ["寒冷", "阴雨"]:
-                    scores["cold_weather_meal_recommendation"] += 2
-                elif weather in ["炎热", "晴朗"]:
-                    scores["summer_refreshing_meal_recommendation"] += 2
-
-        # 优先级排序
-        priority_order = [
-            "festival", "game_recommendation",
-            "weight_loss", "intermittent_fasting",
-            "healthy_diet", "vegetarian",
-            "seasonal_food", "child_or_elderly",
-            "order"
-        ]
-
-        best_intent = max(scores, key=scores.get)
-        tied_intents = [intent for intent, score in scores.items() if score == scores[best_intent]]
-
-        if len(tied_intents) > 1:
-            for intent in priority_order:
-                if intent in tied_intents:
-                    return intent
-
-        return best_intent
+            self._apply_slot_boosts(scores, slots)
+        ranked = tuple(sorted(scores.items(), key=lambda item: (-item[1], self._rank[item[0]])))
+
+        if key is not None:
+            self._cache.put(key, ranked)
+        return ranked
+
+    def cache_stats(self):
+        """分类缓存的命中统计，未启用缓存时返回 None"""
+        return self._cache.stats() if self._cache is not None else None
 
+    def rank(self, text, slots=None, top_k=None):
+        """
+        计算意图得分并排序
+        :param text: 用户输入文本或 TextAnalysis
+        :param slots: 槽位字典（可选）
+        :param top_k: 返回前 k 个，默认返回全部
+        :return: list of (intent, score)，按得分降序、优先级升序排列
+        """
+        ranked = list(self._scored_intents(text, slots))
+        if top_k is not None and len(ranked) >= top_k:
+            return ranked[:top_k]
+
+        # 补齐未命中的意图（得分为 0）
+        scored = {intent for intent, _ in ranked}
+        for intent in self._ranked_intents:
+            if intent not in scored:
+                ranked.append((intent, 0))
+                if top_k is not None and len(ranked) >= top_k:
+                    break
+        return ranked
+
+    def classify(self, text, slots=None):
+        return self.rank(text, slots, top_k=1)[0][0]
@@ -0,0 +1,82 @@
+import threading
+from collector.prompt_builder.cache import LRUCache
+from collector.prompt_builder.metrics import METRICS
+from database import DB
+
+# 用户画像缓存默认条数与有效期（秒）
+PROFILE_CACHE_SIZE = 4096
+PROFILE_CACHE_TTL = 300
+
+
+class ProfileCache:
+    """
+    用户画像（历史订单 + 玩过的游戏）缓存：一次查询取回两份数据，按 LRU 淘汰并按 TTL 过期；
+    下单后通过 DB.record_order 的回调使对应用户的缓存失效
+    """
+
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL, loader=None, subscribe=True,
+                 metrics=None):
+        """
+        :param maxsize: 最大缓存用户数
+        :param ttl: 有效期（秒）
+        :param loader: 加载函数 user_id -> {"order_history": [...], "played_games": [...]}，
+                       默认 DB.get_user_profile
+        :param subscribe: 是否注册下单回调，下单后自动失效
+        :param metrics: MetricsRegistry，默认为进程级 METRICS
+        """
+        self._cache = LRUCache(maxsize, name="user_profile", ttl=ttl)
+        self._loader = loader
+        self.metrics = metrics or METRICS
+        self._subscribed = subscribe
+        # 正在加载的用户：user_id -> [进行中的加载数, 失效次数]，加载期间发生失效时不写入缓存
+        self._loading = {}
+        self._lock = threading.Lock()
+        if subscribe:
+            DB.register_order_listener(self.invalidate)
+
+    def get(self, user_id):
+        """
+        :return: {"order_history": [...], "played_games": [...]}（只读使用）
+        """
+        profile = self._cache.get(user_id)
+        if profile is not None:
+            return profile
+
+        with self._lock:
+            state = self._loading.setdefault(user_id, [0, 0])
+            state[0] += 1
+            generation = state[1]
+        loader = self._loader or DB.get_user_profile
+        try:
+            with self.metrics.timer("profile_load"):
+                profile = loader(user_id)
+        finally:
+            with self._lock:
+                state[0] -= 1
+                if state[0] == 0:
+                    del self._loading[user_id]
+                # 加载期间该用户下过单，读到的可能是旧数据，本次照常返回但不缓存
+                if profile is not None and state[1] == generation:
+                    self._cache.put(user_id, profile)
+        return profile
+
+    def invalidate(self, user_id):
+        """使某个用户的缓存失效（下单、修改画像后调用）"""
+        with self._lock:
+            state = self._loading.get(user_id)
+            if state is not None:
+                state[1] += 1
+            self._cache.pop(user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def close(self):
+        """注销下单回调"""
+        if self._subscribed:
+            DB.unregister_order_listener(self.invalidate)
+            self._subscribed = False
+
+    def stats(self):
+        """命中统计，加载耗时见 METRICS 中的 profile_load 阶段"""
+        return self._cache.stats()
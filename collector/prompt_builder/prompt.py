@@ -1,41 +1,173 @@
 # prompt.py - 完整的 PromptBuilder 实现
 
+import asyncio
+import functools
 import os
-import jieba
-from collector.prompt_builder.slot_extractor import extract_slots
+from collector.prompt_builder.lazy import JIEBA, LazyResource
+from collector.prompt_builder.analysis import TextAnalysis
+from collector.prompt_builder.compaction import PromptCompactor
+from collector.prompt_builder.lexicon import KeywordAutomaton
+from collector.prompt_builder.metrics import METRICS
 from collector.prompt_builder.nlu_service import IntentClassifier
-from database.DB  import get_user_order_history, get_user_played_games
+from collector.prompt_builder.result_cache import USER_REQUEST_PLACEHOLDER
+from collector.prompt_builder.session import merge_slots
+from database.DB  import get_user_order_history, get_user_played_games, get_user_profile
 from mcp.weather_client import get_weather_by_location
 from collector.prompt_builder.config import (
     GAME_RECOMMENDATION_RULES,
     GAME_ENVIRONMENT_MAP,
     ORDER_KEYWORDS,
-    INTENT_TO_TEMPLATE_MAP
+    INTENT_TO_TEMPLATE_MAP,
+    LOOKUP_TIMEOUTS
 )
-from collector.prompt_builder.template import PromptTemplateLoader
+from collector.prompt_builder.template import DEFAULT_TEMPLATE_PATH, PromptTemplateLoader
+
+ORDER_AUTOMATON = KeywordAutomaton((keyword, None) for keyword in ORDER_KEYWORDS)
+
+# 流式输出时每段的最小字符数
+STREAM_CHUNK_SIZE = 256
+
+# 外部查询超时或失败时使用的默认值
+LOOKUP_FALLBACKS = {
+    "weather": dict,
+    "order_history": list,
+    "played_games": list,
+    "user_profile": lambda: {"order_history": [], "played_games": []},
+}
+
+COLLECTOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DICT_PATH = os.path.join(COLLECTOR_DIR, "custom_dict.txt")
+
+
+def _split_line_end(line):
+    """拆分 splitlines(keepends=True) 得到的一行，返回 (行内容, 是否以换行符结尾)"""
+    content = line.splitlines()[0] if line else ""
+    return content, len(content) != len(line)
+
+
+def iter_nonempty_lines(fragments, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    增量版的 remove_empty_lines：逐段读入文本，去除空行和行尾空白，
+    按不小于 chunk_size 的片段输出；内存占用只与最长的一行和 chunk_size 有关
+    :param fragments: 字符串片段的可迭代对象（如 jinja2 Template.generate()）
+    :param chunk_size: 每次输出的最小字符数
+    """
+    pending = ""
+    buffer = []
+    buffered = 0
+    first = True
+
+    def emit(content):
+        nonlocal first, buffered
+        if not content.strip():
+            return
+        piece = content.rstrip() if first else "\n" + content.rstrip()
+        first = False
+        buffer.append(piece)
+        buffered += len(piece)
+
+    for fragment in fragments:
+        pending += fragment
+        lines = pending.splitlines(keepends=True)
+        pending = ""
+        for line in lines:
+            content, complete = _split_line_end(line)
+            if complete:
+                emit(content)
+            else:
+                pending = content
+        if buffered >= chunk_size:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered = 0
+
+    emit(pending)
+    if buffer:
+        yield "".join(buffer)
 
 
 class PromptBuilder:
-    def __init__(self, max_length=512,use_ml_intent=False, dict_path="E:\\work\\waiter\\collector\\custom_dict.txt"):
+    def __init__(self, max_length=512,use_ml_intent=False, dict_path=DEFAULT_DICT_PATH, intent_cache_size=0,
+                 ml_options=None, intent_mode=None, cascade_options=None, metrics=None,
+                 template_path=DEFAULT_TEMPLATE_PATH, template_cache_dir=None, template_watch_interval=None,
+                 template_source=None, token_budget=None, compaction=False, lookup_timeouts=None,
+                 profile_cache=None, weather_cache=None, result_cache=None, session_store=None):
+        """
+        :param use_ml_intent: 兼容旧参数，等价于 intent_mode="ml"
+        :param intent_mode: 意图识别方式 rule / ml / cascade，默认 rule
+        :param cascade_options: 透传给 CascadeIntentClassifier 的阈值，如 rule_margin、ml_margin
+        :param metrics: 分阶段耗时统计使用的 MetricsRegistry，默认为进程级 METRICS
+        :param template_path: 提示词模板 YAML 路径
+        :param template_cache_dir: 模板字节码缓存目录（可选）
+        :param template_watch_interval: 模板热加载轮询间隔（秒），默认不启用
+        :param template_source: 模板来源（如 DatabaseTemplateSource），默认读取 template_path
+        :param token_budget: 提示词 token 预算，设置后超出预算时按优先级删除段落
+        :param compaction: 未设置 token_budget 时是否仍做去空、去重压缩
+        :param lookup_timeouts: build_prompt_async 中各外部查询的超时（秒），覆盖 LOOKUP_TIMEOUTS 的对应项
+        :param profile_cache: ProfileCache（可选），设置后用户数据一次查询取回并缓存
+        :param weather_cache: WeatherCache（可选），设置后天气按城市缓存，过期时先返回旧值再后台刷新
+        :param result_cache: PromptResultCache（可选），设置后 build_prompt 复用相同请求与上下文的渲染结果，
+                             此时槽位提取与意图识别基于归一化（全角转半角）后的文本
+        :param session_store: SessionStore（可选），设置后传入 session_id 的请求合并之前轮次的槽位并填充历史对话
+        """
         self.max_length = max_length
+        self.metrics = metrics or METRICS
+        self.lookup_timeouts = {**LOOKUP_TIMEOUTS, **(lookup_timeouts or {})}
+        self.profile_cache = profile_cache
+        self.weather_cache = weather_cache
+        self.result_cache = result_cache
+        if result_cache is not None:
+            result_cache.bind_metrics(self.metrics)
+        self.session_store = session_store
         self.default_language = 'zh-CN'
         self.dict_path = dict_path
-        template_file_path = "E:\\work\\waiter\\collector\\templates\\prompt_templates.yaml"
-        self.template_manager = PromptTemplateLoader(template_file_path)
+        self.compactor = None
+        if compaction or token_budget is not None:
+            self.compactor = PromptCompactor(token_budget, metrics=self.metrics)
+        self.template_manager = PromptTemplateLoader(
+            template_path, bytecode_cache_dir=template_cache_dir, watch_interval=template_watch_interval,
+            source=template_source
+        )
+
+        self.intent_mode = intent_mode or ("ml" if use_ml_intent else "rule")
+        if self.intent_mode not in ("rule", "ml", "cascade"):
+            raise ValueError(f"不支持的意图识别方式: {self.intent_mode}")
 
-        if use_ml_intent:
+        if self.intent_mode in ("ml", "cascade"):
             from collector.prompt_builder.intent_classifier_ml import IntentClassifierML
-            self.intent_classifier = IntentClassifierML()
-            self.intent_classifier.train()  # 训练模型，假设数据已准备好
-            # 加载预训练模型或自行训练
+            # ml_options 透传给 IntentClassifierML，如 compact=True、syntax_batching=True
+            ml_classifier = IntentClassifierML(cache_size=intent_cache_size, metrics=self.metrics,
+                                               **(ml_options or {}))
+            # 加载已持久化的模型，训练数据变化时才重新训练
+            ml_classifier.load_or_train()
+        if self.intent_mode == "ml":
+            self.intent_classifier = ml_classifier
+        elif self.intent_mode == "cascade":
+            from collector.prompt_builder.cascade import CascadeIntentClassifier
+            self.intent_classifier = CascadeIntentClassifier(
+                IntentClassifier(cache_size=intent_cache_size, metrics=self.metrics), ml_classifier,
+                metrics=self.metrics, **(cascade_options or {})
+            )
         else:
-            from collector.prompt_builder.nlu_service import IntentClassifier
-            self.intent_classifier = IntentClassifier()
+            self.intent_classifier = IntentClassifier(cache_size=intent_cache_size, metrics=self.metrics)
 
-        # 加载自定义词典
-        self._load_custom_dict()
+        # jieba 词典与自定义词典在首次分词时才加载
+        self._tokenizer = LazyResource(self._create_tokenizer, name="jieba")
 
-    def _load_custom_dict(self):
+    def _create_tokenizer(self):
+        jieba = JIEBA.get()
+        self._load_custom_dict(jieba)
+        return jieba
+
+    def warmup(self):
+        """
+        预加载分词词典和意图模型，部署时在接收流量前调用
+        """
+        self._tokenizer.get()
+        if hasattr(self.intent_classifier, "warmup"):
+            self.intent_classifier.warmup()
+
+    def _load_custom_dict(self, jieba):
         """加载自定义词典"""
         if os.path.exists(self.dict_path):
             try:
@@ -48,8 +180,9 @@ class PromptBuilder:
 
     def reload_custom_dict(self):
         """重新加载自定义词典（热加载）"""
+        jieba = self._tokenizer.get()
         jieba.del_word(" ")  # 清除缓存词汇（可选）
-        self._load_custom_dict()
+        self._load_custom_dict(jieba)
         print("[INFO] 自定义词典已重新加载")
 
     def _clean_input(self, text):
@@ -70,26 +203,40 @@ class PromptBuilder:
 
         return text
 
+    def _tokenize(self, text):
+        """
+        对中文文本进行分词，使用自定义词典提升识别准确率
+        :param text: 输入文本
+        :return: 分词列表（拼接后与原文一致）
+        """
+        if not text:
+            return []
+        return list(self._tokenizer.get().cut(text, cut_all=False))
+
     def _chinese_tokenize(self, text):
         """
         对中文文本进行分词，使用自定义词典提升识别准确率
         :param text: 输入文本
         :return: 分词后的字符串
         """
-        if not text:
-            return ""
+        return " ".join(self._tokenize(text))
 
-        tokens = jieba.cut(text, cut_all=False)
-        return " ".join(tokens)
+    def analyze(self, text):
+        """
+        构建本次请求共享的文本分析结果（分词、关键词命中、槽位等按需计算并缓存）
+        :param text: 清洗后的文本
+        :return: TextAnalysis
+        """
+        return TextAnalysis(text, tokenizer=self._tokenize)
 
     def detect_order_intent(self, text):
         """
         检测用户是否有下单意图
+        :param text: 文本或 TextAnalysis（后者只统计不跨词的命中）
         """
-        for keyword in ORDER_KEYWORDS:
-            if keyword in text:
-                return True
-        return False
+        if isinstance(text, TextAnalysis):
+            return bool(text.keyword_hits(ORDER_AUTOMATON, within_tokens=True))
+        return ORDER_AUTOMATON.contains_any(text)
 
     def build_prompt(self, input_text, user_id=None, location="北京", is_order_placed=False, **kwargs):
         """
@@ -98,30 +245,227 @@ class PromptBuilder:
         :param user_id: 用户ID（用于获取历史数据）
         :param location: 当前城市（用于天气和地方菜系）
         :param is_order_placed: 是否已下单（外部传入）
-        :param kwargs: 其他参数（如 template_name, language 等）
+        :param kwargs: 其他参数（如 template_name, language, template_version, session_id 等）
+        :return: 构建好的提示词
+        """
+        with self.metrics.timer("build_prompt"):
+            # 多轮会话的结果依赖会话状态，不走结果缓存
+            if self.result_cache is not None and not kwargs.get("session_id"):
+                return self._build_prompt_cached(input_text, user_id, location, is_order_placed, **kwargs)
+            plan = self._prepare_render(input_text, user_id, location, is_order_placed, **kwargs)
+            return self._render(*plan)
+
+    def _build_prompt_cached(self, input_text, user_id, location, is_order_placed, **kwargs):
+        """
+        先查询天气与用户数据组成缓存键，命中时跳过槽位提取、意图识别和渲染；
+        缓存的渲染结果中用户请求为占位符，取出后替换为本次原文再去空行、压缩
+        """
+        with self.metrics.timer("clean"):
+            normalized_text = self._clean_input(self.result_cache.normalize(input_text))
+        weather_info, order_history, played_games = self._fetch_context(location, user_id)
+        key = self.result_cache.make_key(
+            normalized_text, location, is_order_placed, weather_info, order_history, played_games,
+            self.template_manager.version,
+            template_name=kwargs.get("template_name"),
+            language=kwargs.get("language"),
+            template_version=kwargs.get("template_version")
+        )
+
+        cached = self.result_cache.get(key)
+        if cached is None:
+            analysis, slots = self._analyze_input(normalized_text)
+            template_name, language, version, context_dict = self._select_template(
+                USER_REQUEST_PLACEHOLDER, analysis, slots, is_order_placed,
+                weather_info, order_history, played_games, location, **kwargs
+            )
+            with self.metrics.timer("render"):
+                rendered = self.template_manager.get_template(template_name, lang=language, version=version,
+                                                              **context_dict)
+            self.result_cache.put(key, template_name, rendered)
+        else:
+            template_name, rendered = cached
+
+        prompt = self.remove_empty_lines(rendered.replace(USER_REQUEST_PLACEHOLDER, input_text))
+        return self._compact(prompt, template_name)
+
+    async def build_prompt_async(self, input_text, user_id=None, location="北京", is_order_placed=False,
+                                 executor=None, **kwargs):
+        """
+        异步构建提示词：天气、历史订单、玩过的游戏三个外部查询并发执行，各自有超时和兜底默认值；
+        分词、槽位提取、意图识别和渲染等 CPU 计算放到线程池中执行，不阻塞事件循环
+        参数同 build_prompt
+        :param executor: 执行同步函数的线程池，默认使用事件循环的默认线程池
         :return: 构建好的提示词
         """
+        loop = asyncio.get_running_loop()
+        with self.metrics.timer("build_prompt_async"):
+            lookups = [self._lookup_async("weather", location, executor)]
+            if user_id and self.profile_cache is not None:
+                lookups.append(self._lookup_async("user_profile", user_id, executor))
+            elif user_id:
+                lookups.append(self._lookup_async("order_history", user_id, executor))
+                lookups.append(self._lookup_async("played_games", user_id, executor))
+            analyzed, weather_info, *user_data = await asyncio.gather(
+                loop.run_in_executor(executor, self._analyze_input, input_text),
+                *lookups
+            )
+            if len(user_data) == 1:
+                order_history, played_games = user_data[0]["order_history"], user_data[0]["played_games"]
+            else:
+                order_history, played_games = user_data or ([], [])
+
+            analysis, slots = analyzed
+            plan = await loop.run_in_executor(executor, functools.partial(
+                self._select_template, input_text, analysis, slots, is_order_placed,
+                weather_info, order_history, played_games, location, **kwargs
+            ))
+            return await loop.run_in_executor(executor, functools.partial(self._render, *plan))
+
+    def _lookup_functions(self):
+        # 每次调用时再取模块级函数，便于替换为真实的网络/数据库查询
+        return {
+            "weather": self.weather_cache.get if self.weather_cache is not None else get_weather_by_location,
+            "order_history": get_user_order_history,
+            "played_games": get_user_played_games,
+            "user_profile": self.profile_cache.get if self.profile_cache is not None else get_user_profile,
+        }
+
+    async def _lookup_async(self, name, argument, executor=None):
+        """
+        执行一次外部查询，超时或出错时返回兜底默认值
+        :param name: 查询名，对应 LOOKUP_TIMEOUTS 的键
+        """
+        func = self._lookup_functions()[name]
+        timeout = self.lookup_timeouts.get(name)
+        with self.metrics.timer(name):
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    return await asyncio.wait_for(func(argument), timeout)
+                loop = asyncio.get_running_loop()
+                # 超时后线程池中的调用不会被中断，只是不再等待其结果
+                return await asyncio.wait_for(loop.run_in_executor(executor, func, argument), timeout)
+            except asyncio.TimeoutError:
+                print(f"[WARNING] {name} 查询超时（{timeout}s），使用默认值")
+                self.metrics.inc("lookup_fallbacks_total", lookup=name, reason="timeout")
+            except Exception as e:
+                print(f"[WARNING] {name} 查询失败，使用默认值: {e}")
+                self.metrics.inc("lookup_fallbacks_total", lookup=name, reason="error")
+        return LOOKUP_FALLBACKS[name]()
+
+    def _render(self, template_name, language, version, context_dict):
+        with self.metrics.timer("render"):
+            rendered_prompt = self.template_manager.get_template(
+                template_name, lang=language, version=version, **context_dict
+            )
+            prompt = self.remove_empty_lines(rendered_prompt)
+        return self._compact(prompt, template_name)
+
+    def _compact(self, prompt, template_name):
+        """未启用压缩时原样返回"""
+        if self.compactor is None:
+            return prompt
+        with self.metrics.timer("compaction"):
+            return self.compactor.compact(prompt, template_name).text
+
+    def build_prompt_stream(self, input_text, user_id=None, location="北京", is_order_placed=False,
+                            chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+        """
+        流式构建提示词：槽位、意图等在调用时立即计算（出错时直接抛出），
+        模板通过 jinja2 generate() 逐段渲染并增量去除空行（启用压缩时先渲染完整再分段输出）
+        参数同 build_prompt
+        :param chunk_size: 每次输出的最小字符数（最后一段可能更短）
+        :return: 字符串片段的生成器，拼接后与 build_prompt 的结果一致
+        """
+        with self.metrics.timer("prepare_stream"):
+            template_name, language, version, context_dict = self._prepare_render(
+                input_text, user_id, location, is_order_placed, **kwargs
+            )
+        fragments = self.template_manager.stream_template(template_name, lang=language, version=version,
+                                                          **context_dict)
+        if self.compactor is not None:
+            # 压缩需要完整的提示词，渲染完成后再按 chunk_size 分段输出
+            prompt = self._compact("".join(iter_nonempty_lines(fragments, chunk_size)), template_name)
+            return (prompt[i:i + chunk_size] for i in range(0, len(prompt), chunk_size))
+        return iter_nonempty_lines(fragments, chunk_size)
+
+    def _prepare_render(self, input_text, user_id, location, is_order_placed, **kwargs):
+        """
+        渲染前的全部步骤（同步依次执行）
+        :return: (模板名, 语言, 模板版本, 模板上下文)
+        """
+        analysis, slots = self._analyze_input(input_text)
+        weather_info, order_history, played_games = self._fetch_context(location, user_id)
+        return self._select_template(input_text, analysis, slots, is_order_placed,
+                                     weather_info, order_history, played_games, location, **kwargs)
+
+    def _analyze_input(self, input_text):
+        """
+        输入清洗、分词与槽位提取
+        :return: (TextAnalysis, 槽位字典副本)
+        """
+        timer = self.metrics.timer
+
         # 1. 归一化输入
-        cleaned_text = self._clean_input(input_text)
+        with timer("clean"):
+            cleaned_text = self._clean_input(input_text)
 
+        analysis = self.analyze(cleaned_text)
+        with timer("tokenize"):
+            analysis.tokens  # 提前触发分词，使其单独计时
 
-        # 2. 提取槽位
-        slots = extract_slots(cleaned_text)
-        tokenized_text = self._chinese_tokenize(cleaned_text)
-        slots.update(extract_slots(tokenized_text))
+        # 2. 提取槽位（原文与分词边界一起，单次完成）
+        with timer("slot_extraction"):
+            slots = dict(analysis.slots)
+        return analysis, slots
 
-        # 3. 自动检测是否已下单
-        is_order_placed = is_order_placed or self.detect_order_intent(tokenized_text)
+    def _fetch_context(self, location, user_id):
+        """
+        依次查询天气与用户数据
+        :return: (天气信息, 历史订单, 玩过的游戏)
+        """
+        timer = self.metrics.timer
 
-        # 4. 获取天气信息
-        weather_info = get_weather_by_location(location)
+        # 获取天气信息
+        with timer("weather"):
+            if self.weather_cache is not None:
+                weather_info = self.weather_cache.get(location)
+            else:
+                weather_info = get_weather_by_location(location)
 
-        # 5. 获取用户数据（可选）
+        # 获取用户数据（可选）
         order_history = []
         played_games = []
-        if user_id:
-            order_history = get_user_order_history(user_id)
-            played_games = get_user_played_games(user_id)
+        if user_id and self.profile_cache is not None:
+            with timer("user_profile"):
+                profile = self.profile_cache.get(user_id)
+            order_history, played_games = profile["order_history"], profile["played_games"]
+        elif user_id:
+            with timer("order_history"):
+                order_history = get_user_order_history(user_id)
+            with timer("played_games"):
+                played_games = get_user_played_games(user_id)
+        return weather_info, order_history, played_games
+
+    def _select_template(self, input_text, analysis, slots, is_order_placed, weather_info, order_history,
+                         played_games, location, **kwargs):
+        """
+        下单检测、槽位补全、游戏推荐、上下文构建与模板选择
+        :return: (模板名, 语言, 模板版本, 模板上下文)
+        """
+        timer = self.metrics.timer
+
+        # 合并会话中之前轮次的槽位：本轮提取到的同名槽位优先，忌口、过敏原取并集
+        session_id = kwargs.get("session_id") if self.session_store is not None else None
+        conversation_history = ""
+        if session_id:
+            with timer("session"):
+                session_slots, conversation_history = self.session_store.snapshot(session_id)
+                self.session_store.append(session_id, input_text, slots)
+            slots = merge_slots(session_slots, slots)
+
+        # 3. 自动检测是否已下单
+        with timer("order_detection"):
+            is_order_placed = is_order_placed or self.detect_order_intent(analysis)
 
         # 6. 补全缺失槽位（如人数未提供时尝试推断）
         if "人数" not in slots and "朋友聚会" in slots.get("场景", ""):
@@ -152,7 +496,8 @@ class PromptBuilder:
             played_games=played_games,
             game_recommendation=game_recommendation,
             user_request=input_text,
-            location=location
+            location=location,
+            conversation_history=conversation_history
         )
 
         # 9. 模板选择
@@ -160,13 +505,13 @@ class PromptBuilder:
         if is_order_placed and not template_name:
             template_name = "pre_meal_game_recommendation"
         elif not template_name:
-            intent = self.intent_classifier.classify(input_text, slots)
+            with timer("intent"):
+                intent = self.intent_classifier.classify(analysis, slots)
             template_name = self.intent_choose_template(intent)
 
         language = kwargs.get("language", self.default_language)
+        return template_name, language, kwargs.get("template_version"), context_dict
 
-        rendered_prompt = self.template_manager.get_template(template_name, lang=language, **context_dict)
-        return self.remove_empty_lines(rendered_prompt)
     def remove_empty_lines(self, text):
         """
         去除文本中的空行（包括只含空白字符的行）
@@ -251,7 +596,8 @@ class PromptBuilder:
         return INTENT_TO_TEMPLATE_MAP.get(intent, "enhanced_basic_with_all")
 
 
-    def _map_slots_to_template_vars(self, slots, weather_info, order_history, played_games, game_recommendation, user_request, location):
+    def _map_slots_to_template_vars(self, slots, weather_info, order_history, played_games, game_recommendation, user_request, location,
+                                    conversation_history=""):
         """
         将槽位字段映射为模板变量，并补充额外信息
         :param slots: 提取的槽位字典
@@ -261,6 +607,7 @@ class PromptBuilder:
         :param game_recommendation: 推荐的游戏列表
         :param user_request: 用户原始请求
         :param location: 当前城市（用于地方菜系）
+        :param conversation_history: 历史对话文本（多轮会话时由 SessionStore 提供）
         :return: 可供模板渲染使用的上下文字典
         """
 
@@ -287,7 +634,7 @@ class PromptBuilder:
             "special_event": slots.get("特殊节日"),
 
             # 历史数据
-            "conversation_history": "",  # 如果有对话历史可传入
+            "conversation_history": conversation_history,
             "order_history": "\n".join(order_history) if order_history else "无",
 
             # 游戏推荐字段
@@ -0,0 +1,93 @@
+import hashlib
+import sys
+from collector.prompt_builder.cache import LRUCache, normalize_text
+
+# 提示词结果缓存默认上限：条数与估算总字节数
+RESULT_CACHE_SIZE = 10000
+RESULT_CACHE_BYTES = 32 * 1024 * 1024
+
+# 缓存的渲染结果中代替用户原始请求的占位符，取出时替换为本次请求的原文
+USER_REQUEST_PLACEHOLDER = "\x00user_request\x00"
+
+
+def _digest(value):
+    return hashlib.blake2b(repr(value).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def weather_fingerprint(weather_info):
+    """天气信息指纹，天气或温度变化后缓存键随之变化"""
+    return tuple(sorted((str(name), repr(value)) for name, value in (weather_info or {}).items()))
+
+
+def profile_version(order_history, played_games):
+    """用户画像版本：历史订单和玩过的游戏内容的摘要，下单后自然变化"""
+    if not order_history and not played_games:
+        return None
+    return _digest((list(order_history or []), list(played_games or [])))
+
+
+def _sizeof(entry):
+    template_name, rendered = entry
+    return sys.getsizeof(template_name) + sys.getsizeof(rendered)
+
+
+class PromptResultCache:
+    """
+    渲染结果缓存：文本、城市、天气、用户画像和模板版本都相同的请求直接复用渲染结果，
+    跳过槽位提取、意图识别和渲染；按条数和估算字节数做 LRU 淘汰
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, max_bytes=RESULT_CACHE_BYTES, ttl=None, metrics=None):
+        """
+        :param maxsize: 最大条数
+        :param max_bytes: 渲染结果的估算总字节数上限
+        :param ttl: 有效期（秒），默认不过期（上下文变化已体现在缓存键中）
+        :param metrics: 命中统计使用的 MetricsRegistry，未指定时使用所属 PromptBuilder 的 metrics
+        """
+        self._cache = LRUCache(maxsize, name="prompt_result", ttl=ttl, max_bytes=max_bytes, sizeof=_sizeof,
+                               metrics=metrics)
+
+    def bind_metrics(self, metrics):
+        """构造时未指定 metrics 时，改为上报到给定的 MetricsRegistry（由 PromptBuilder 调用）"""
+        if self._cache.metrics is None:
+            self._cache.metrics = metrics
+
+    @staticmethod
+    def normalize(text):
+        """请求文本归一化：全角转半角、合并连续空白"""
+        return normalize_text(text)
+
+    @staticmethod
+    def make_key(normalized_text, location, is_order_placed, weather_info, order_history, played_games,
+                 templates_version, template_name=None, language=None, template_version=None):
+        """
+        :param normalized_text: 归一化并清洗后的请求文本
+        :param templates_version: 模板加载器的版本号，模板重新加载后旧结果不再命中
+        :return: 可哈希的缓存键
+        """
+        return (
+            normalized_text,
+            location,
+            bool(is_order_placed),
+            weather_fingerprint(weather_info),
+            profile_version(order_history, played_games),
+            templates_version,
+            template_name,
+            language,
+            template_version,
+        )
+
+    def get(self, key):
+        """
+        :return: (模板名, 含占位符的渲染结果)，未命中返回 None
+        """
+        return self._cache.get(key)
+
+    def put(self, key, template_name, rendered):
+        self._cache.put(key, (template_name, rendered))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,140 @@
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from collector.prompt_builder.cache import LRUCache, slot_fingerprint
+from collector.prompt_builder.slot_extractor import LIST_SLOTS
+
+# 会话默认保留的轮数、空闲过期时间（秒）、最大会话数与估算总字节数
+SESSION_MAX_TURNS = 8
+SESSION_TTL = 1800
+SESSION_MAX_SESSIONS = 10000
+SESSION_MAX_BYTES = 64 * 1024 * 1024
+
+# 每轮保存的用户文本最大长度
+TURN_TEXT_LIMIT = 200
+
+# 一轮对话的紧凑表示：截断后的用户文本 + 本轮提取到的槽位指纹
+Turn = namedtuple("Turn", ["text", "slots"])
+
+
+def _turn_size(turn):
+    return sys.getsizeof(turn.text) + sum(sys.getsizeof(value) for item in turn.slots for value in item)
+
+
+def _slots_size(slots):
+    size = sys.getsizeof(slots)
+    for name, value in slots.items():
+        size += sys.getsizeof(name) + sys.getsizeof(value)
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def merge_slots(accumulated, slots):
+    """
+    合并槽位：LIST_SLOTS（忌口、过敏原）按顺序取并集并去重，其他槽位以本轮的值为准
+    :param accumulated: 之前轮次累计的槽位
+    :param slots: 本轮提取到的槽位
+    :return: 合并后的新字典
+    """
+    merged = dict(accumulated)
+    for name, value in slots.items():
+        previous = merged.get(name)
+        if name in LIST_SLOTS and isinstance(previous, list) and isinstance(value, list):
+            merged[name] = list(dict.fromkeys(previous + value))
+        else:
+            merged[name] = value
+    return merged
+
+
+class DialogueState:
+    """
+    单个会话的对话状态：最近若干轮的环形缓冲区 + 逐轮合并的累计槽位
+    每轮的更新只涉及本轮槽位和固定长度的缓冲区，与会话总轮数无关
+    """
+
+    def __init__(self, max_turns=SESSION_MAX_TURNS):
+        self.turns = deque(maxlen=max_turns)
+        self.slots = {}
+        self.turn_count = 0
+        self._turns_bytes = 0
+        self.nbytes = _slots_size(self.slots)
+
+    def add_turn(self, text, slots):
+        """
+        :param text: 本轮用户输入
+        :param slots: 本轮提取到的槽位，合并规则见 merge_slots
+        """
+        turn = Turn((text or "")[:TURN_TEXT_LIMIT], slot_fingerprint(slots))
+        if len(self.turns) == self.turns.maxlen:
+            self._turns_bytes -= _turn_size(self.turns[0])
+        self.turns.append(turn)
+        self._turns_bytes += _turn_size(turn)
+        self.slots = merge_slots(self.slots, slots)
+        # 槽位种类有限，每轮重新估算累计槽位的大小
+        self.nbytes = self._turns_bytes + _slots_size(self.slots)
+        self.turn_count += 1
+
+    def history_text(self):
+        """最近几轮的用户输入，按时间顺序每行一轮"""
+        return "\n".join(f"用户：{turn.text}" for turn in self.turns)
+
+
+class SessionStore:
+    """
+    按会话 ID 保存对话状态，空闲超过 ttl 的会话过期，按会话数和估算字节数做 LRU 淘汰
+    """
+
+    def __init__(self, max_turns=SESSION_MAX_TURNS, ttl=SESSION_TTL, max_sessions=SESSION_MAX_SESSIONS,
+                 max_bytes=SESSION_MAX_BYTES, clock=time.monotonic):
+        """
+        :param max_turns: 每个会话保留的最近轮数
+        :param ttl: 空闲过期时间（秒），每轮对话后重新计时
+        :param max_sessions: 最大会话数
+        :param max_bytes: 全部会话的估算总字节数上限
+        :param clock: 时间函数，测试时可替换
+        """
+        self.max_turns = max_turns
+        self._sessions = LRUCache(max_sessions, name="session", ttl=ttl, clock=clock, max_bytes=max_bytes,
+                                  sizeof=lambda state: state.nbytes)
+        self._lock = threading.Lock()
+
+    def snapshot(self, session_id):
+        """
+        :return: (累计槽位副本, 历史对话文本)，会话不存在或已过期时为 ({}, "")
+        """
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return {}, ""
+            return dict(state.slots), state.history_text()
+
+    def append(self, session_id, text, slots):
+        """
+        记录一轮对话并合并槽位，同时刷新会话的过期时间和占用字节数
+        :param session_id: 会话 ID
+        :param text: 本轮用户输入
+        :param slots: 本轮提取到的槽位
+        """
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = DialogueState(self.max_turns)
+            state.add_turn(text, slots)
+            self._sessions.put(session_id, state)
+
+    def end(self, session_id):
+        """结束会话，删除其状态"""
+        with self._lock:
+            self._sessions.pop(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        return self._sessions.stats()
@@ -1,44 +1,147 @@
 import re
+from collections import namedtuple
 from collector.prompt_builder.config import SLOT_DICT
-from fuzzywuzzy import process
+from collector.prompt_builder.lexicon import KeywordAutomaton
+from collector.prompt_builder.fuzzy_index import FuzzySlotIndex
+from collector.prompt_builder.metrics import METRICS
 
+# source 取值：exact / fuzzy / numeric
+SlotMatch = namedtuple("SlotMatch", ["slot", "value", "start", "end", "source"])
 
-def extract_slots(text: str, threshold=80) -> dict:
-    slots = {}
+# 可以有多个取值的槽位
+LIST_SLOTS = ("忌口", "过敏原")
 
-    # 预处理：插入空格，帮助 jieba 更好切分数字+量词+名词结构
-    #text = preprocess_text(text)
+PEOPLE_PATTERN = re.compile(r'(\d+)个?[人位]')
+BUDGET_PATTERN = re.compile(r'(\d{2,4})元')
 
-    # 1. 数字型槽位提取
-    slots.update(extract_numeric_slots(text))
 
-    # 2. 精确关键词匹配
-    for slot_name, keywords in SLOT_DICT.items():
-        matched = None
+def build_slot_automaton(slot_dict):
+    """
+    将槽位词典编译为多模式匹配自动机
+    :param slot_dict: {槽位名: [关键词, ...]}
+    :return: KeywordAutomaton，命中数据为 (槽位名, 关键词在列表中的序号)
+    """
+    return KeywordAutomaton(
+        (keyword, (slot_name, index))
+        for slot_name, keywords in slot_dict.items()
+        for index, keyword in enumerate(keywords)
+    )
 
-        # 精确匹配
-        for keyword in keywords:
-            if keyword in text:
-                matched = keyword
-                break
 
-        # 若未匹配，尝试模糊匹配
-        if not matched:
-            matched, score = process.extractOne(text, keywords)
-            if score < threshold:
-                continue
+# 模块加载时编译一次，请求路径上只做线性扫描
+SLOT_AUTOMATON = build_slot_automaton(SLOT_DICT)
+SLOT_FUZZY_INDEX = FuzzySlotIndex(SLOT_DICT)
+
+
+def find_slot_hits(text, automaton=None):
+    """
+    单次扫描文本，返回所有槽位关键词命中
+    :param text: 输入文本
+    :param automaton: 槽位自动机，默认使用 SLOT_AUTOMATON
+    :return: list of (start, end, slot_name, keyword)
+    """
+    automaton = SLOT_AUTOMATON if automaton is None else automaton
+    return [
+        (start, end, slot_name, keyword)
+        for start, end, keyword, (slot_name, _) in automaton.find_all(text)
+    ]
+
+
+def token_boundaries(text, tokens):
+    """
+    根据分词结果计算每个词在原文中的区间
+    :param text: 原文
+    :param tokens: 分词结果（拼接后应与原文一致）
+    :return: list of (start, end)；分词与原文不一致时返回 None
+    """
+    if tokens is None or "".join(tokens) != text:
+        return None
+    spans, offset = [], 0
+    for token in tokens:
+        spans.append((offset, offset + len(token)))
+        offset += len(token)
+    return spans
+
+
+def _within_token(start, end, token_ends):
+    """命中区间是否落在单个词内部（没有跨越词边界）"""
+    return not any(start < boundary < end for boundary in token_ends)
+
+
+def _exact_matches(text, token_ends=None, hits=None):
+    """
+    每个槽位选出一个精确命中：优先落在单个词内部的命中，其次按词表顺序
+    （未提供分词边界时与逐词 `in` 判断的优先级一致）
+    :param hits: 已有的 SLOT_AUTOMATON 命中结果（可选，缺省时现场扫描）
+    :return: {槽位名: (start, end, 关键词)}
+    """
+    if hits is None:
+        hits = SLOT_AUTOMATON.iter_matches(text)
+    best = {}
+    for start, end, keyword, (slot_name, index) in hits:
+        crosses = token_ends is not None and not _within_token(start, end, token_ends)
+        rank = (crosses, index)
+        if slot_name not in best or rank < best[slot_name][0]:
+            best[slot_name] = (rank, (start, end, keyword))
+    return {slot_name: hit for slot_name, (_, hit) in best.items()}
 
-        # 设置槽位值
-        if slot_name in ["忌口", "过敏原"]:
-            slots.setdefault(slot_name, []).append(matched)
-        else:
-            slots[slot_name] = matched
 
+def extract_slot_spans(text, tokens=None, threshold=80, hits=None):
+    """
+    单次完成数字、精确、模糊三类槽位提取，返回带位置和来源的结果
+    :param text: 清洗后的原文
+    :param tokens: 原文的分词结果（可选），用于优先选择不跨词的命中
+    :param threshold: 模糊匹配阈值
+    :param hits: 已有的 SLOT_AUTOMATON 命中结果（可选）
+    :return: list of SlotMatch，按槽位在原文中的位置排序
+    """
+    if not text:
+        return []
 
+    # 1. 数字型槽位
+    matches = extract_numeric_spans(text)
 
+    # 2. 精确关键词匹配（一次扫描得到所有槽位的命中）
+    spans = token_boundaries(text, tokens)
+    token_ends = [end for _, end in spans] if spans else None
+    exact = _exact_matches(text, token_ends, hits)
+    for slot_name, (start, end, keyword) in exact.items():
+        matches.append(SlotMatch(slot_name, keyword, start, end, "exact"))
+
+    # 3. 未精确命中的槽位统一走模糊索引
+    missing = [slot_name for slot_name in SLOT_DICT if slot_name not in exact]
+    if missing:
+        fuzzy_matches = SLOT_FUZZY_INDEX.match(text, threshold, missing)
+        for slot_name, fuzzy in fuzzy_matches.items():
+            matches.append(SlotMatch(slot_name, fuzzy.alias, fuzzy.start, fuzzy.end, "fuzzy"))
+        if fuzzy_matches:
+            METRICS.inc("slot_fuzzy_fallbacks_total", len(fuzzy_matches))
+
+    matches.sort(key=lambda m: (m.start, m.end))
+    return matches
+
+
+def slots_from_matches(matches):
+    """
+    将 SlotMatch 列表转换为槽位字典（与 extract_slots 的返回格式一致）
+    :param matches: extract_slot_spans 的结果
+    :return: {槽位名: 值}，忌口/过敏原为列表
+    """
+    slots = {}
+    for match in matches:
+        if match.slot in LIST_SLOTS:
+            slots.setdefault(match.slot, []).append(match.value)
+        else:
+            slots[match.slot] = match.value
     return slots
 
 
+def extract_slots(text: str, threshold=80) -> dict:
+    # 预处理：插入空格，帮助 jieba 更好切分数字+量词+名词结构
+    #text = preprocess_text(text)
+    return slots_from_matches(extract_slot_spans(text, threshold=threshold))
+
+
 def preprocess_text(text):
     """预处理文本，提高数字+量词模式的识别能力"""
     # 插入空格，强制切分数字+量词+名词结构
@@ -47,11 +150,16 @@ def preprocess_text(text):
     return text
 
 
+def extract_numeric_spans(text):
+    """提取数字型槽位，返回 SlotMatch 列表"""
+    matches = []
+    if m := PEOPLE_PATTERN.search(text):
+        matches.append(SlotMatch("人数", int(m.group(1)), m.start(), m.end(), "numeric"))
+    if m := BUDGET_PATTERN.search(text):
+        matches.append(SlotMatch("预算", int(m.group(1)), m.start(), m.end(), "numeric"))
+    return matches
+
+
 def extract_numeric_slots(text):
     """统一提取数字型槽位"""
-    numeric_slots = {}
-    if m := re.search(r'(\d+)个?[人位]', text):
-        numeric_slots["人数"] = int(m.group(1))
-    if m := re.search(r'(\d{2,4})元', text):
-        numeric_slots["预算"] = int(m.group(1))
-    return numeric_slots
+    return {match.slot: match.value for match in extract_numeric_spans(text)}
@@ -1,38 +1,296 @@
 import yaml
-from jinja2 import Environment, meta
+import threading
+from collections import namedtuple
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, meta
 import os
+from collector.prompt_builder.cache import LRUCache
+from collector.prompt_builder.config import INTENT_TO_TEMPLATE_MAP
+
+COLLECTOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TEMPLATE_PATH = os.path.join(COLLECTOR_DIR, "templates", "prompt_templates.yaml")
+
+# 按请求固定版本时：已编译历史版本的缓存条数；不存在的版本的缓存条数与有效期（秒），
+# 有效期内同一个不存在的版本不再查询模板来源，过期后可查到之后发布的版本
+PINNED_CACHE_SIZE = 256
+PINNED_MISS_CACHE_SIZE = 1024
+PINNED_MISS_TTL = 60
+
+# variables 为模板中引用的全部未声明变量，渲染时据此过滤上下文；version 为模板来源给出的版本号
+CompiledTemplate = namedtuple("CompiledTemplate", ["name", "lang", "template", "variables", "version"],
+                              defaults=(None,))
+
+
+def _source_name(template_name, lang):
+    return f"{template_name}/{lang}"
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class YamlTemplateSource:
+    """
+    从 YAML 文件读取模板：{模板名: {语言: 模板字符串}}，不区分版本
+    模板来源需实现 signature() / load() / load_version() 三个方法
+    """
+
+    def __init__(self, template_file_path=DEFAULT_TEMPLATE_PATH):
+        self.template_file_path = template_file_path
+
+    def __str__(self):
+        return self.template_file_path
+
+    def signature(self):
+        """内容变化时随之变化的标识，这里使用文件的 (mtime_ns, size)"""
+        return _file_signature(self.template_file_path)
+
+    def load(self):
+        """
+        :return: (templates, versions, signature)
+                 templates 为 {模板名: {语言: 模板字符串}}，versions 为 {(模板名, 语言): 版本号}
+        """
+        signature = self.signature()
+        with open(self.template_file_path, 'r', encoding='utf-8') as f:
+            templates = yaml.safe_load(f)
+        return templates, {}, signature
+
+    def load_version(self, template_name, lang, version):
+        """读取指定版本的模板内容，不存在时返回 None"""
+        return None
+
+
+class TemplateRegistry:
+    """
+    某一版本模板编译后的只读快照，热加载时整体替换而不是原地修改
+    """
+
+    def __init__(self, templates, bytecode_cache=None, signature=None, versions=None):
+        """
+        :param templates: {模板名: {语言: 模板字符串}}
+        :param bytecode_cache: jinja2 字节码缓存（可选）
+        :param signature: 模板来源的内容标识，用于判断是否需要重新加载
+        :param versions: {(模板名, 语言): 版本号}（可选）
+        """
+        if not isinstance(templates, dict):
+            raise ValueError("模板文件格式错误：顶层必须是 {模板名: {语言: 模板}}")
+        self.templates = templates
+        self.signature = signature
+        self.versions = versions or {}
+        sources = {}
+        for name, by_lang in templates.items():
+            if not isinstance(by_lang, dict):
+                raise ValueError(f"模板 {name} 格式错误：必须是 {{语言: 模板}}")
+            for lang, raw_template in by_lang.items():
+                sources[_source_name(name, lang)] = raw_template
+        self.env = Environment(loader=DictLoader(sources), bytecode_cache=bytecode_cache)
+        self.compiled = self._compile_all()
+
+    def _compile_all(self):
+        """
+        编译全部模板，返回 {(模板名, 语言): CompiledTemplate}
+        """
+        compiled = {}
+        for name, by_lang in self.templates.items():
+            for lang, raw_template in by_lang.items():
+                compiled[(name, lang)] = CompiledTemplate(
+                    name=name,
+                    lang=lang,
+                    template=self.env.get_template(_source_name(name, lang)),
+                    variables=frozenset(meta.find_undeclared_variables(self.env.parse(raw_template))),
+                    version=self.versions.get((name, lang)),
+                )
+        return compiled
+
+    @property
+    def languages(self):
+        return {lang for _, lang in self.compiled}
+
+    def validate(self, required_names=None):
+        """
+        校验意图映射到的每个模板在每种语言下都存在
+        :param required_names: 必须存在的模板名，默认取 INTENT_TO_TEMPLATE_MAP 的全部取值
+        """
+        required = set(INTENT_TO_TEMPLATE_MAP.values()) if required_names is None else set(required_names)
+        missing = sorted(
+            f"{name}/{lang}" for name in required for lang in self.languages
+            if (name, lang) not in self.compiled
+        )
+        if missing:
+            raise ValueError(f"模板缺失: {', '.join(missing)}")
+
 
 class PromptTemplateLoader:
-    def __init__(self, template_file_path):
-        with open(template_file_path, 'r', encoding='utf-8') as f:
-            self.templates = yaml.safe_load(f)
+    def __init__(self, template_file_path=DEFAULT_TEMPLATE_PATH, bytecode_cache_dir=None, watch_interval=None,
+                 source=None):
+        """
+        加载全部模板并一次性编译
+        :param template_file_path: 模板文件路径（未指定 source 时使用）
+        :param bytecode_cache_dir: jinja2 字节码缓存目录（可选），新启动的 worker 可跳过编译
+        :param watch_interval: 热加载轮询间隔（秒），None 表示不监听模板变化
+        :param source: 模板来源（如 database.template_store.DatabaseTemplateSource），默认读取 YAML 文件
+        """
+        self.source = source or YamlTemplateSource(template_file_path)
+        self.template_file_path = template_file_path if source is None else None
+        self._bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            self._bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
 
-    def get_template(self, template_name, lang='zh-CN', **kwargs):
+        self._registry = self._load_registry()
+        self.version = 1
+        # 按请求固定版本时用到的历史版本，版本内容不可变，编译后缓存；不存在的版本也短时间缓存
+        self._pinned = LRUCache(PINNED_CACHE_SIZE, name="template_pinned")
+        self._pinned_missing = LRUCache(PINNED_MISS_CACHE_SIZE, name="template_pinned_missing", ttl=PINNED_MISS_TTL)
+        self._pinned_env = Environment(bytecode_cache=self._bytecode_cache)
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher = None
+        if watch_interval:
+            self.start_watching(watch_interval)
+
+    def _load_registry(self):
+        templates, versions, signature = self.source.load()
+        registry = TemplateRegistry(templates, self._bytecode_cache, signature, versions)
+        registry.validate()
+        return registry
+
+    @property
+    def templates(self):
+        return self._registry.templates
+
+    @property
+    def registry(self):
+        return self._registry.compiled
+
+    @property
+    def env(self):
+        return self._registry.env
+
+    def reload(self):
+        """
+        重新读取、编译并校验全部模板，全部通过后整体替换当前版本；
+        失败时保留旧版本继续服务
+        :return: 是否替换成功
+        """
+        with self._reload_lock:
+            try:
+                registry = self._load_registry()
+            except Exception as e:
+                print(f"[ERROR] 模板热加载失败，继续使用旧版本: {e}")
+                return False
+            # 单次引用赋值即完成切换，正在渲染的请求继续使用它已取到的旧版本
+            self._registry = registry
+            self.version += 1
+            # 模板来源有变化，之前查不到的版本可能已经发布
+            self._pinned_missing.clear()
+            print(f"[INFO] 模板 {self.source} 已重新加载（版本 {self.version}）")
+            return True
+
+    def check_for_update(self):
+        """
+        模板来源的内容标识（文件 mtime/大小、数据库中激活的版本）变化时重新加载
+        :return: 是否加载了新版本
+        """
+        try:
+            signature = self.source.signature()
+        except Exception as e:
+            print(f"[WARNING] 无法读取模板状态: {e}")
+            return False
+        if signature == self._registry.signature:
+            return False
+        return self.reload()
+
+    def start_watching(self, interval=2.0):
+        """启动后台线程按 interval 秒轮询模板来源"""
+        if self._watcher is not None:
+            return
+        self._stop_event.clear()
+
+        def watch():
+            while not self._stop_event.wait(interval):
+                self.check_for_update()
+
+        self._watcher = threading.Thread(target=watch, name="template-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is None:
+            return
+        self._stop_event.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def get_compiled(self, template_name, lang='zh-CN', version=None):
+        """
+        :param version: 固定使用的模板版本（可选，用于 A/B 测试），默认使用当前激活版本
+        :return: CompiledTemplate
+        """
+        registry = self._registry
+        compiled = registry.compiled.get((template_name, lang))
+        if version is not None and (compiled is None or compiled.version != version):
+            return self._get_pinned(template_name, lang, version)
+        if compiled is None:
+            if template_name not in registry.templates:
+                raise ValueError(f"模板 {template_name} 不存在")
+            raise ValueError(f"模板 {template_name} 不支持语言 {lang}")
+        return compiled
+
+    def _get_pinned(self, template_name, lang, version):
+        """
+        取固定版本的模板。每个版本只在首次使用时（或被 LRU 淘汰后）查询一次模板来源，
+        之后的请求不再访问数据库；不存在的版本在 PINNED_MISS_TTL 内直接报错，不重复查询
+        """
+        key = (template_name, lang, version)
+        compiled = self._pinned.get(key)
+        if compiled is not None:
+            return compiled
+        if key in self._pinned_missing:
+            raise ValueError(f"模板 {template_name}（{lang}）不存在版本 {version}")
+        raw_template = self.source.load_version(template_name, lang, version)
+        if raw_template is None:
+            self._pinned_missing.put(key, True)
+            raise ValueError(f"模板 {template_name}（{lang}）不存在版本 {version}")
+        compiled = CompiledTemplate(
+            name=template_name,
+            lang=lang,
+            template=self._pinned_env.from_string(raw_template),
+            variables=frozenset(meta.find_undeclared_variables(self._pinned_env.parse(raw_template))),
+            version=version,
+        )
+        # 并发时可能重复编译同一版本，结果相同，直接覆盖即可
+        self._pinned.put(key, compiled)
+        return compiled
+
+    def get_template(self, template_name, lang='zh-CN', version=None, **kwargs):
         """
         获取并渲染模板
         :param template_name: 模板名称
         :param lang: 语言版本
+        :param version: 固定使用的模板版本（可选）
         :param kwargs: 上下文参数
         :return: 渲染后的提示词
         """
-        if template_name not in self.templates:
-            raise ValueError(f"模板 {template_name} 不存在")
-
-        if lang not in self.templates[template_name]:
-            raise ValueError(f"模板 {template_name} 不支持语言 {lang}")
-
-        raw_template = self.templates[template_name][lang]
-        used_vars = self._extract_used_variables(raw_template)
+        compiled = self.get_compiled(template_name, lang, version)
 
         # 过滤掉模板中没有使用的变量
         filtered_context = {
-            k: v for k, v in kwargs.items() if k in used_vars or k.startswith('_')
+            k: v for k, v in kwargs.items() if k in compiled.variables or k.startswith('_')
         }
 
         # 渲染模板
-        env = Environment()
-        template = env.from_string(raw_template)
-        return template.render(**filtered_context)
+        return compiled.template.render(**filtered_context)
+
+    def stream_template(self, template_name, lang='zh-CN', version=None, **kwargs):
+        """
+        流式渲染模板
+        :return: jinja2 generate() 返回的字符串片段生成器
+        """
+        compiled = self.get_compiled(template_name, lang, version)
+        filtered_context = {
+            k: v for k, v in kwargs.items() if k in compiled.variables or k.startswith('_')
+        }
+        return compiled.template.generate(**filtered_context)
 
     def _extract_used_variables(self, template_str):
         """
@@ -40,6 +298,5 @@ class PromptTemplateLoader:
         :param template_str: 模板字符串
         :return: set of variable names
         """
-        env = Environment()
-        ast = env.parse(template_str)
+        ast = self.env.parse(template_str)
         return meta.find_undeclared_variables(ast)
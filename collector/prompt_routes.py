@@ -0,0 +1,68 @@
+# prompt_routes.py
+from flask import Response, jsonify, request, stream_with_context
+from collector.prompt_builder.lazy import LazyResource
+from constant.constant import MAX_INPUT_LENGTH
+
+
+class PromptRoutes:
+    def __init__(self, app, prompt_builder=None, builder_options=None):
+        """
+        :param app: Flask 应用
+        :param prompt_builder: 已创建的 PromptBuilder（可选），默认在第一次请求时创建
+        :param builder_options: 创建 PromptBuilder 时的参数
+        """
+        self.app = app
+        self.LOGGER = app.logger
+        self.MAX_INPUT_LENGTH = MAX_INPUT_LENGTH
+        self._builder_options = builder_options or {}
+        # 并发的首批请求只创建一个 PromptBuilder
+        if prompt_builder is None:
+            self._prompt_builder = LazyResource(self._create_builder, name="prompt_builder")
+        else:
+            self._prompt_builder = LazyResource(lambda: prompt_builder, name="prompt_builder")
+
+    def _create_builder(self):
+        from collector.prompt_builder.prompt import PromptBuilder
+        return PromptBuilder(**self._builder_options)
+
+    @property
+    def prompt_builder(self):
+        return self._prompt_builder.get()
+
+    def register_routes(self):
+        """注册路由"""
+        @self.app.route('/prompt/stream', methods=['POST'])
+        def stream_prompt():
+            """
+            流式返回构建好的提示词（chunked 传输），下游可以边接收边处理
+            请求体 JSON：text（必填）、user_id、location、language、template_name、template_version
+            """
+            data = request.get_json(silent=True) or {}
+            user_text = data.get("text", "")
+
+            if not user_text:
+                self.LOGGER.warning("收到空文本输入")
+                return jsonify({"error": "文本不能为空"}), 400
+
+            if len(user_text) > self.MAX_INPUT_LENGTH:
+                self.LOGGER.warning(f"输入文本过长: {len(user_text)} > {self.MAX_INPUT_LENGTH}")
+                return jsonify({"error": f"输入文本过长，超过{self.MAX_INPUT_LENGTH}字符"}), 413
+
+            options = {key: data[key] for key in ("language", "template_name", "template_version", "session_id")
+                       if data.get(key)}
+            try:
+                # 槽位提取、意图识别等在这里完成，出错时仍可返回错误码；之后只剩模板渲染
+                chunks = self.prompt_builder.build_prompt_stream(
+                    user_text,
+                    user_id=data.get("user_id"),
+                    location=data.get("location") or "北京",
+                    **options
+                )
+            except ValueError as e:
+                self.LOGGER.warning(f"构建提示词失败: {e}")
+                return jsonify({"error": str(e)}), 400
+            except Exception as e:
+                self.LOGGER.error(f"构建提示词时出错: {str(e)}", exc_info=True)
+                return jsonify({"error": "内部服务器错误"}), 500
+
+            return Response(stream_with_context(chunks), mimetype="text/plain; charset=utf-8")
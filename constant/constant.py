@@ -1,2 +1,3 @@
 MAX_INPUT_LENGTH = 1000  # 最大输入长度限制
-SUPPORTED_LANGUAGES = ['zh-CN', 'en-US']  # 支持的语言
\ No newline at end of file
+SUPPORTED_LANGUAGES = ['zh-CN', 'en-US']  # 支持的语言
+AUDIO_SPOOL_MAX_SIZE = 10 * 1024 * 1024  # 音频上传在内存中缓冲的上限（字节），超过后转存到临时文件
@@ -1,16 +1,36 @@
 
+# 模拟数据库数据，实际应从数据库中查询
+_MOCK_PLAYED_GAMES = {
+    "U123456": ["麻将", "斗地主"],
+    "U987654": ["狼人杀", "真心话大冒险"]
+}
+
+_MOCK_ORDER_HISTORY = {
+    "U123456": [
+        "水煮鱼",
+        "宫保鸡丁",
+        "麻婆豆腐",
+        "冰可乐 × 2"
+    ],
+    "U987654": [
+        "清蒸鲈鱼",
+        "西兰花炒虾仁",
+        "南瓜粥",
+        "柠檬水"
+    ]
+}
+
+# 下单后需要通知的回调（如用户画像缓存失效），参数为 user_id
+_order_listeners = []
+
+
 def get_user_played_games(user_id):
     """
     根据用户ID查询玩过的游戏
     :param user_id: 用户唯一标识
     :return: 游戏列表
     """
-    mock_data = {
-        "U123456": ["麻将", "斗地主"],
-        "U987654": ["狼人杀", "真心话大冒险"]
-    }
-
-    return mock_data.get(user_id, [])
+    return list(_MOCK_PLAYED_GAMES.get(user_id, []))
 
 # collector/db/user_profile_db.py
 
@@ -20,20 +40,44 @@ def get_user_order_history(user_id):
     :param user_id: 用户唯一标识
     :return: 历史订单列表
     """
-    # 模拟数据库数据，实际应从数据库中查询
-    mock_data = {
-        "U123456": [
-            "水煮鱼",
-            "宫保鸡丁",
-            "麻婆豆腐",
-            "冰可乐 × 2"
-        ],
-        "U987654": [
-            "清蒸鲈鱼",
-            "西兰花炒虾仁",
-            "南瓜粥",
-            "柠檬水"
-        ]
-    }
     #构建完整的模板管理系统
-    return mock_data.get(user_id, [])
+    return list(_MOCK_ORDER_HISTORY.get(user_id, []))
+
+
+def get_user_profile(user_id):
+    """
+    一次查询同时取回历史订单和玩过的游戏（实际数据库中为一条联合查询）
+    :param user_id: 用户唯一标识
+    :return: {"order_history": [...], "played_games": [...]}
+    """
+    return {
+        "order_history": list(_MOCK_ORDER_HISTORY.get(user_id, [])),
+        "played_games": list(_MOCK_PLAYED_GAMES.get(user_id, []))
+    }
+
+
+def register_order_listener(callback):
+    """
+    注册下单回调，record_order 写入成功后以 user_id 调用
+    :param callback: 函数 user_id -> None
+    """
+    _order_listeners.append(callback)
+
+
+def unregister_order_listener(callback):
+    if callback in _order_listeners:
+        _order_listeners.remove(callback)
+
+
+def record_order(user_id, items):
+    """
+    记录一次下单（模拟写库），写入后通知所有下单回调
+    :param user_id: 用户唯一标识
+    :param items: 菜品列表
+    """
+    _MOCK_ORDER_HISTORY.setdefault(user_id, []).extend(items)
+    for callback in list(_order_listeners):
+        try:
+            callback(user_id)
+        except Exception as e:
+            print(f"[ERROR] 下单回调执行失败: {e}")
@@ -0,0 +1,193 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# 与 waiter.sql 中 templates / template_versions 表结构一致的 SQLite 版本，用于本地运行和测试
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    language VARCHAR(50) NOT NULL,
+    version VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (name, language, version)
+);
+
+CREATE TABLE IF NOT EXISTS template_versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    template_id INT NOT NULL,
+    version VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (template_id) REFERENCES templates(id)
+);
+
+CREATE TRIGGER IF NOT EXISTS templates_updated_at AFTER UPDATE ON templates
+BEGIN
+    UPDATE templates SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+"""
+
+
+class DatabaseTemplateSource:
+    """
+    从 templates / template_versions 表读取模板，作为 PromptTemplateLoader 的模板来源
+    只在加载、轮询和首次使用固定版本时访问数据库，渲染路径不访问数据库
+    """
+
+    # DB-API 参数占位符（MySQL 驱动为 %s）
+    placeholder = "%s"
+
+    def __init__(self, connect):
+        """
+        :param connect: 无参函数，返回一个 DB-API 连接（每次查询后关闭）
+        """
+        self._connect = connect
+
+    def __str__(self):
+        return "database:templates"
+
+    @contextmanager
+    def _cursor(self):
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _sql(self, sql):
+        return sql.replace("?", self.placeholder)
+
+    def _fetchall(self, sql, params=()):
+        with self._cursor() as cursor:
+            cursor.execute(self._sql(sql), params)
+            return cursor.fetchall()
+
+    def signature(self):
+        """激活版本的 (id, version, updated_at) 列表，发布、切换或修改模板后随之变化"""
+        return tuple(tuple(row) for row in self._fetchall(
+            "SELECT id, version, updated_at FROM templates WHERE is_active = 1 ORDER BY id"
+        ))
+
+    def load(self):
+        """
+        读取全部激活的模板，同一 (name, language) 有多条激活记录时以最新的一条为准
+        :return: (templates, versions, signature)
+        """
+        with self._cursor() as cursor:
+            cursor.execute(self._sql(
+                "SELECT id, name, language, version, content, updated_at FROM templates "
+                "WHERE is_active = 1 ORDER BY id"
+            ))
+            rows = cursor.fetchall()
+
+        templates, versions, signature = {}, {}, []
+        for row_id, name, language, version, content, updated_at in rows:
+            templates.setdefault(name, {})[language] = content
+            versions[(name, language)] = version
+            signature.append((row_id, version, updated_at))
+        return templates, versions, tuple(signature)
+
+    def load_version(self, template_name, lang, version):
+        """
+        读取指定版本的模板内容，先查 templates，再查 template_versions 历史记录
+        :return: 模板内容，不存在时返回 None
+        """
+        rows = self._fetchall(
+            "SELECT content FROM templates WHERE name = ? AND language = ? AND version = ?",
+            (template_name, lang, version)
+        )
+        if not rows:
+            rows = self._fetchall(
+                "SELECT v.content FROM template_versions v JOIN templates t ON v.template_id = t.id "
+                "WHERE t.name = ? AND t.language = ? AND v.version = ? ORDER BY v.id DESC",
+                (template_name, lang, version)
+            )
+        return rows[0][0] if rows else None
+
+    def publish(self, name, language, version, content, activate=True):
+        """
+        发布一个新版本的模板并记录到 template_versions
+        :param activate: 是否同时设为该 (name, language) 的激活版本
+        """
+        with self._cursor() as cursor:
+            cursor.execute(self._sql(
+                "SELECT id FROM templates WHERE name = ? AND language = ? AND version = ?"
+            ), (name, language, version))
+            if cursor.fetchall():
+                raise ValueError(f"模板 {name}（{language}）版本 {version} 已存在")
+            if activate:
+                cursor.execute(self._sql(
+                    "UPDATE templates SET is_active = 0 WHERE name = ? AND language = ? AND is_active = 1"
+                ), (name, language))
+            cursor.execute(self._sql(
+                "INSERT INTO templates (name, language, version, content, is_active) VALUES (?, ?, ?, ?, ?)"
+            ), (name, language, version, content, bool(activate)))
+            template_id = cursor.lastrowid
+            cursor.execute(self._sql(
+                "INSERT INTO template_versions (template_id, version, content) VALUES (?, ?, ?)"
+            ), (template_id, version, content))
+
+    def activate(self, name, language, version):
+        """将已发布的某个版本设为激活版本（用于回滚）"""
+        with self._cursor() as cursor:
+            cursor.execute(self._sql(
+                "SELECT id FROM templates WHERE name = ? AND language = ? AND version = ?"
+            ), (name, language, version))
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"模板 {name}（{language}）不存在版本 {version}")
+            cursor.execute(self._sql(
+                "UPDATE templates SET is_active = 0 WHERE name = ? AND language = ? AND is_active = 1"
+            ), (name, language))
+            cursor.execute(self._sql("UPDATE templates SET is_active = 1 WHERE id = ?"), (row[0],))
+
+    def import_templates(self, templates, version):
+        """
+        将 YAML 格式的模板字典整体导入为同一版本
+        :param templates: {模板名: {语言: 模板字符串}}
+        """
+        for name, by_lang in templates.items():
+            for language, content in by_lang.items():
+                self.publish(name, language, version, content)
+
+
+class SQLiteTemplateSource(DatabaseTemplateSource):
+    """
+    SQLite 版本的模板库，本地运行和测试使用；默认使用内存数据库
+    """
+
+    placeholder = "?"
+
+    def __init__(self, db_path=":memory:"):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.executescript(SQLITE_SCHEMA)
+        super().__init__(lambda: self._conn)
+
+    def __str__(self):
+        return "sqlite:templates"
+
+    @contextmanager
+    def _cursor(self):
+        with self._lock:
+            cursor = self._conn.cursor()
+            try:
+                yield cursor
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def close(self):
+        self._conn.close()
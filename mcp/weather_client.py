@@ -1,6 +1,31 @@
 # collector/mcp/weather_client.py
 
-import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collector.prompt_builder.cache import LRUCache
+from collector.prompt_builder.metrics import METRICS
+
+# 天气缓存默认有效期（秒）与首次查询的等待上限（秒）
+WEATHER_CACHE_TTL = 600
+WEATHER_TIMEOUT = 0.5
+
+# 过期后仍可返回旧值的时长（秒）与最多缓存的城市数
+WEATHER_MAX_STALE = 3600
+WEATHER_CACHE_SIZE = 1024
+
+# 模拟不同城市的天气数据
+WEATHER_MAPPING = {
+    "北京": {"weather": "晴朗", "temperature": 25},
+    "上海": {"weather": "多云", "temperature": 28},
+    "广州": {"weather": "炎热", "temperature": 34},
+    "成都": {"weather": "阴天", "temperature": 22},
+    "哈尔滨": {"weather": "寒冷", "temperature": -5},
+    "深圳": {"weather": "雷阵雨", "temperature": 30}
+}
+
+UNKNOWN_WEATHER = {"weather": "未知", "temperature": 20}
+
 
 def get_weather_by_location(location):
     """
@@ -8,14 +33,150 @@ def get_weather_by_location(location):
     :param location: 地点名称（如“北京”、“成都”）
     :return: 包含天气和温度的字典
     """
-    # 模拟不同城市的天气数据
-    weather_mapping = {
-        "北京": {"weather": "晴朗", "temperature": 25},
-        "上海": {"weather": "多云", "temperature": 28},
-        "广州": {"weather": "炎热", "temperature": 34},
-        "成都": {"weather": "阴天", "temperature": 22},
-        "哈尔滨": {"weather": "寒冷", "temperature": -5},
-        "深圳": {"weather": "雷阵雨", "temperature": 30}
-    }
-
-    return weather_mapping.get(location, {"weather": "未知", "temperature": 20})
+    return WEATHER_MAPPING.get(location, UNKNOWN_WEATHER)
+
+
+class FakeWeatherProvider:
+    """
+    本地模拟的天气服务，可设置延迟和故障，记录每次调用的城市
+    """
+
+    def __init__(self, data=None, delay=0.0, fail=False):
+        """
+        :param data: {城市: 天气字典}，默认 WEATHER_MAPPING
+        :param delay: 每次调用的延迟（秒）
+        :param fail: 为 True 时每次调用都抛出异常
+        """
+        self.data = dict(WEATHER_MAPPING if data is None else data)
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, location):
+        with self._lock:
+            self.calls.append(location)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("天气服务不可用")
+        return dict(self.data.get(location, UNKNOWN_WEATHER))
+
+
+class WeatherCache:
+    """
+    按城市缓存天气（stale-while-revalidate）：
+    - 未过期直接返回；
+    - 过期后 max_stale 秒内先返回旧值，同时在后台刷新，同一城市同时只有一个刷新任务；
+    - 没有缓存（或旧值已超过 max_stale）时最多等待 timeout 秒，超时或失败返回 fallback，加载完成后写入缓存
+    条目存放在按城市数淘汰的 LRUCache 中，命中/未命中计入 metrics 的 cache_hits_total{cache="weather"}，
+    旧值命中、降级、刷新和查询失败计入 weather_*_total
+    """
+
+    def __init__(self, provider=None, ttl=WEATHER_CACHE_TTL, timeout=WEATHER_TIMEOUT, fallback=None,
+                 max_workers=4, clock=time.monotonic, max_stale=WEATHER_MAX_STALE, maxsize=WEATHER_CACHE_SIZE,
+                 metrics=None):
+        """
+        :param provider: 天气查询函数 location -> dict，默认 get_weather_by_location
+        :param ttl: 缓存有效期（秒）
+        :param timeout: 没有缓存时等待查询结果的时间（秒）
+        :param fallback: 超时或失败时返回的天气，默认 UNKNOWN_WEATHER
+        :param max_workers: 后台刷新线程数
+        :param clock: 时间函数，测试时可替换
+        :param max_stale: 过期后仍返回旧值的时长（秒），超过后条目被删除
+        :param maxsize: 最多缓存的城市数
+        :param metrics: MetricsRegistry，默认为进程级 METRICS
+        """
+        self.provider = provider or get_weather_by_location
+        self.ttl = ttl
+        self.timeout = timeout
+        self.fallback = UNKNOWN_WEATHER if fallback is None else fallback
+        self.metrics = metrics or METRICS
+        self._clock = clock
+        self._entries = LRUCache(maxsize, name="weather", ttl=ttl + max_stale, clock=clock, metrics=self.metrics)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="weather-refresh")
+        self.stale_hits = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def _refresh(self, location):
+        """提交刷新任务（调用方持有锁），已有进行中的任务时直接复用"""
+        future = self._inflight.get(location)
+        if future is None:
+            self.refreshes += 1
+            self.metrics.inc("weather_refreshes_total")
+            future = self._executor.submit(self._load, location)
+            self._inflight[location] = future
+        return future
+
+    def _load(self, location):
+        try:
+            value = self.provider(location)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            self.metrics.inc("weather_errors_total")
+            print(f"[WARNING] 查询 {location} 天气失败: {e}")
+            raise
+        else:
+            with self._lock:
+                self._entries.put(location, (self._clock(), value))
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(location, None)
+
+    def get(self, location):
+        """
+        :param location: 城市
+        :return: 天气字典（只读使用）
+        """
+        with self._lock:
+            entry = self._entries.get(location)
+            if entry is not None:
+                fetched_at, value = entry
+                if self._clock() - fetched_at >= self.ttl:
+                    self.stale_hits += 1
+                    self.metrics.inc("weather_stale_hits_total")
+                    self._refresh(location)
+                return value
+            future = self._refresh(location)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self.fallbacks += 1
+            self.metrics.inc("weather_fallbacks_total")
+            return self.fallback
+
+    def invalidate(self, location=None):
+        """删除某个城市（默认全部）的缓存"""
+        with self._lock:
+            if location is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(location)
+
+    def stats(self):
+        """hits 只统计未过期的命中，stale_hits 为返回旧值的次数"""
+        with self._lock:
+            entries = self._entries.stats()
+            return {
+                "size": entries["size"],
+                "hits": entries["hits"] - self.stale_hits,
+                "stale_hits": self.stale_hits,
+                "misses": entries["misses"],
+                "evictions": entries["evictions"],
+                "expirations": entries["expirations"],
+                "fallbacks": self.fallbacks,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "hit_ratio": entries["hit_ratio"],
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,64 @@
+import unittest
+from collector.prompt_builder.analysis import TextAnalysis, find_hits
+from collector.prompt_builder.lexicon import KeywordAutomaton
+from collector.prompt_builder.nlu_service import IntentClassifier
+from collector.prompt_builder.slot_extractor import extract_slots
+
+
+class CountingAutomaton(KeywordAutomaton):
+    def __init__(self, keywords):
+        super().__init__(keywords)
+        self.scans = 0
+
+    def find_all(self, text):
+        self.scans += 1
+        return super().find_all(text)
+
+
+class TestTextAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.tokenize_calls = []
+
+        def tokenizer(text):
+            self.tokenize_calls.append(text)
+            return ["来", "点", "不", "辣的", "，", "订桌"]
+
+        self.analysis = TextAnalysis("来点不辣的，订桌", tokenizer=tokenizer)
+
+    def test_tokens_computed_once(self):
+        self.assertEqual(self.analysis.tokenized_text, "来 点 不 辣的 ， 订桌")
+        self.assertEqual(self.analysis.token_ends, [1, 2, 3, 5, 6, 8])
+        _ = self.analysis.slots
+        self.assertEqual(len(self.tokenize_calls), 1)
+
+    def test_keyword_hits_memoized(self):
+        automaton = CountingAutomaton([("不辣", None), ("订桌", None)])
+        self.assertEqual(len(self.analysis.keyword_hits(automaton)), 2)
+        self.assertEqual(len(find_hits(self.analysis, automaton)), 2)
+        # "不辣" 跨越 "不 / 辣的" 的词边界
+        self.assertEqual([hit[2] for hit in self.analysis.keyword_hits(automaton, within_tokens=True)], ["订桌"])
+        self.assertEqual(automaton.scans, 1)
+
+    def test_slots_use_token_boundaries(self):
+        self.assertEqual(self.analysis.slots["口味"], "辣的")
+        self.assertEqual(extract_slots(self.analysis.text)["口味"], "不辣")
+
+    def test_syntax_memoized(self):
+        calls = []
+
+        def analyzer(text):
+            calls.append(text)
+            return [("订桌", "v", {"head": 1, "relation": "HED"})]
+
+        self.assertFalse(self.analysis.syntax_loaded)
+        self.analysis.syntax(analyzer)
+        self.analysis.syntax(analyzer)
+        self.assertEqual(len(calls), 1)
+
+    def test_classifier_accepts_analysis(self):
+        classifier = IntentClassifier()
+        self.assertEqual(classifier.classify(self.analysis), classifier.classify(self.analysis.text))
+
+
+if __name__ == '__main__':
+    unittest.main()
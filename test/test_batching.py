@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+from concurrent.futures import TimeoutError
+from collector.prompt_builder.batching import MicroBatcher, BatchQueueFull
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_requests_are_batched(self):
+        batch_sizes = []
+
+        def batch_fn(items):
+            batch_sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+        self.addCleanup(batcher.close)
+        results = {}
+        barrier = threading.Barrier(8)
+
+        def worker(i):
+            barrier.wait()
+            results[i] = batcher.process(i)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {i: i * 2 for i in range(8)})
+        self.assertLess(len(batch_sizes), 8)
+        self.assertEqual(sum(batch_sizes), 8)
+        self.assertTrue(all(size <= 8 for size in batch_sizes))
+
+    def test_errors_propagate_to_callers(self):
+        def batch_fn(items):
+            raise ValueError("boom")
+
+        batcher = MicroBatcher(batch_fn, max_wait_ms=1)
+        self.addCleanup(batcher.close)
+        with self.assertRaises(ValueError):
+            batcher.process("x")
+
+    def test_timeout_and_backpressure(self):
+        release = threading.Event()
+
+        def batch_fn(items):
+            release.wait(2)
+            return items
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+        self.addCleanup(batcher.close)
+        first = batcher.submit("a")
+        time.sleep(0.05)  # 等待后台线程取走第一条
+        batcher.submit("b")
+        with self.assertRaises(BatchQueueFull):
+            batcher.submit("c")
+        with self.assertRaises(TimeoutError):
+            first.result(timeout=0.01)
+        release.set()
+        self.assertEqual(first.result(timeout=1), "a")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import itertools
+import unittest
+from collector.prompt_builder.bulk import build_prompts
+from collector.prompt_builder.prompt import PromptBuilder
+
+REQUESTS = [
+    "4个人，朋友聚会，来个饭前游戏，顺便来几瓶啤酒",
+    {"text": "我想吃点清淡的菜，不吃海鲜。", "location": "成都"},
+    {"input_text": "冬天好冷，想吃点热乎的", "user_id": "U123456"},
+    {"input_text": "你好", "template_name": "no_such_template"},
+    "帮我订个包间",
+]
+
+
+class TestBuildPrompts(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        builder = PromptBuilder()
+        cls.expected = []
+        for request in REQUESTS:
+            kwargs = {"input_text": request} if isinstance(request, str) else dict(request)
+            kwargs.setdefault("input_text", kwargs.pop("text", None))
+            try:
+                cls.expected.append(builder.build_prompt(**kwargs))
+            except ValueError:
+                cls.expected.append(None)
+
+    def check(self, results):
+        self.assertEqual(len(results), len(REQUESTS))
+        for result in results:
+            self.assertEqual(result.prompt, self.expected[result.index])
+            if result.prompt is None:
+                self.assertIn("ValueError", result.error)
+
+    def test_in_process(self):
+        results = list(build_prompts(REQUESTS, workers=1, chunksize=2))
+        self.assertEqual([result.index for result in results], list(range(len(REQUESTS))))
+        self.check(results)
+
+    def test_process_pool_ordered(self):
+        results = list(build_prompts(REQUESTS, workers=2, chunksize=2))
+        self.assertEqual([result.index for result in results], list(range(len(REQUESTS))))
+        self.check(results)
+
+    def test_process_pool_as_completed(self):
+        results = list(build_prompts(iter(REQUESTS), workers=2, chunksize=1, ordered=False))
+        self.check(results)
+
+    def test_input_consumed_lazily(self):
+        pulled = []
+
+        def endless():
+            for i in itertools.count():
+                pulled.append(i)
+                yield "来点清淡的"
+
+        results = build_prompts(endless(), workers=2, chunksize=3, max_pending=2)
+        first = list(itertools.islice(results, 4))
+        results.close()
+        self.assertEqual([result.index for result in first], [0, 1, 2, 3])
+        # 在途最多 max_pending 个分块，外加已输出的分块
+        self.assertLessEqual(len(pulled), 3 * 4 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from collector.prompt_builder.cache import LRUCache, normalize_text, slot_fingerprint
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_and_stats(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # a 变为最近使用
+        cache.put("c", 3)  # 淘汰 b
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 1, 1))
+        self.assertEqual(stats["size"], 2)
+        self.assertAlmostEqual(stats["hit_ratio"], 2 / 3)
+
+    def test_ttl_expiry(self):
+        now = [0.0]
+        cache = LRUCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.put("a", 1)
+        now[0] = 9.9
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 10.0
+        self.assertIsNone(cache.get("a"))
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_max_bytes_eviction(self):
+        cache = LRUCache(maxsize=10, max_bytes=10, sizeof=len)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.put("a", "aa")
+        self.assertEqual(cache.stats()["bytes"], 6)
+        cache.put("c", "cccccc")
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.stats()["bytes"], 8)
+        # 超过上限的单个值不缓存
+        cache.put("d", "d" * 11)
+        self.assertNotIn("d", cache)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=0)
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text("  来几瓶　啤酒！ "), "来几瓶 啤酒!")
+        self.assertEqual(normalize_text("ＢＢＱ"), "BBQ")
+        self.assertEqual(normalize_text(None), "")
+
+    def test_slot_fingerprint(self):
+        self.assertEqual(
+            slot_fingerprint({"忌口": ["不吃辣"], "人数": 4}),
+            slot_fingerprint({"人数": 4, "忌口": ["不吃辣"]})
+        )
+        self.assertEqual(slot_fingerprint(None), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+from unittest import mock
+from collector.prompt_builder import intent_classifier_ml
+from collector.prompt_builder.cascade import CascadeIntentClassifier
+from collector.prompt_builder.intent_classifier_ml import IntentClassifierML
+from collector.prompt_builder.lazy import LazyResource
+from collector.prompt_builder.metrics import METRICS, MetricsRegistry
+from collector.prompt_builder.nlu_service import IntentClassifier
+from test.test_intent_classifier_ml import FakeLTP
+
+
+class TestCascadeIntentClassifier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.TemporaryDirectory()
+        cls.ml_classifier = IntentClassifierML(model_path=cls.model_dir.name)
+        cls.ml_classifier.load_or_train()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model_dir.cleanup()
+
+    def setUp(self):
+        self.fake_ltp = FakeLTP()
+        patcher = mock.patch.object(intent_classifier_ml, "LTP_MODEL", LazyResource(lambda: self.fake_ltp))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rule_tier_skips_model(self):
+        cascade = CascadeIntentClassifier(IntentClassifier(), self.ml_classifier, rule_margin=2)
+        with mock.patch.object(self.ml_classifier, "classify_batch") as classify_batch:
+            self.assertEqual(cascade.classify("想打麻将还是斗地主，玩什么好"), "game_recommendation")
+        classify_batch.assert_not_called()
+        self.assertEqual(self.fake_ltp.batch_sizes, [])
+        self.assertEqual(cascade.tier_stats()["counts"]["rule"], 1)
+
+    def test_tier_counters_use_injected_registry(self):
+        registry = MetricsRegistry()
+        cascade = CascadeIntentClassifier(IntentClassifier(), self.ml_classifier, rule_margin=2, metrics=registry)
+        before = METRICS.counter("intent_cascade_total", tier="rule")
+        cascade.classify("想打麻将还是斗地主，玩什么好")
+        self.assertEqual(registry.counter("intent_cascade_total", tier="rule"), 1)
+        self.assertEqual(METRICS.counter("intent_cascade_total", tier="rule"), before)
+
+    def test_ml_tier_skips_syntax(self):
+        cascade = CascadeIntentClassifier(IntentClassifier(), self.ml_classifier, rule_margin=100, ml_margin=0)
+        ranked, tier = cascade.rank_with_tier("帮我订桌位")
+        self.assertEqual(tier, "ml")
+        self.assertEqual(self.fake_ltp.batch_sizes, [])
+        self.assertEqual(ranked, self.ml_classifier.classify_batch(["帮我订桌位"], use_syntax=False)[0])
+
+    def test_syntax_tier_matches_full_pipeline(self):
+        cascade = CascadeIntentClassifier(IntentClassifier(), self.ml_classifier, rule_margin=100, ml_margin=100)
+        for text, slots in [("有没有低脂的减肥餐", {"健康偏好": "低脂"}), ("玩什么游戏好？", None)]:
+            ranked, tier = cascade.rank_with_tier(text, slots)
+            self.assertEqual(tier, "syntax")
+            expected = dict(self.ml_classifier.classify_batch([text], [slots])[0])
+            self.assertEqual(ranked[0][0], max(expected, key=expected.get))
+            for intent, score in ranked:
+                self.assertAlmostEqual(score, expected[intent])
+
+        stats = cascade.tier_stats()
+        self.assertEqual(stats["counts"], {"rule": 0, "ml": 0, "syntax": 2})
+        self.assertEqual(stats["ratios"]["syntax"], 1.0)
+        cascade.reset_stats()
+        self.assertEqual(cascade.tier_stats()["total"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from collector.prompt_builder.compaction import PromptCompactor, estimate_tokens, split_sections
+from collector.prompt_builder.metrics import MetricsRegistry
+
+PROMPT = """你是一个智能服务员，需要完成以下任务：
+- 理解用户需求
+- 推荐特色菜品
+当前用户请求：来点清淡的
+用户画像分析：
+  - 口味要求：清淡
+  - 忌口要求：None
+外部条件影响：
+  - 当前天气：晴朗
+推荐就餐环境：
+  - 推荐特色菜品
+历史点单记录：
+水煮鱼
+宫保鸡丁
+推荐饮品搭配：
+请根据以上信息综合判断并提供服务。"""
+
+
+class TestCompaction(unittest.TestCase):
+    def setUp(self):
+        self.compactor = PromptCompactor(metrics=MetricsRegistry())
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("清淡"), 2)
+        self.assertEqual(estimate_tokens("BBQ 烤串!"), 4)
+        self.assertEqual(estimate_tokens("12345678"), 2)
+
+    def test_split_sections(self):
+        titles = [section.title for section in split_sections(PROMPT)]
+        self.assertEqual(titles, [None, None, "用户画像分析", "外部条件影响", "推荐就餐环境", "历史点单记录",
+                                  "推荐饮品搭配", None])
+
+    def test_removes_empty_items_sections_and_duplicates(self):
+        result = self.compactor.compact(PROMPT, "enhanced_basic_with_all")
+        self.assertNotIn("忌口要求", result.text)
+        self.assertNotIn("推荐饮品搭配", result.text)
+        # 与角色说明重复的条目只删除正文中的那一条，段落随之变空
+        self.assertIn("- 推荐特色菜品", result.text)
+        self.assertNotIn("推荐就餐环境", result.text)
+        self.assertEqual(result.dropped_sections, [])
+        self.assertLess(result.tokens_after, result.tokens_before)
+
+    def test_empty_list_item_is_not_a_header(self):
+        text = "外部条件影响：\n  - 当前天气：\n  - 是否节日/特殊场合：春节"
+        self.assertEqual([section.title for section in split_sections(text)], ["外部条件影响"])
+        result = self.compactor.compact(text)
+        self.assertEqual(result.text, "外部条件影响：\n  - 是否节日/特殊场合：春节")
+
+    def test_drops_sections_in_order_until_within_budget(self):
+        full = self.compactor.compact(PROMPT).text
+        budget = estimate_tokens(full) - 1
+        result = self.compactor.compact(PROMPT, token_budget=budget)
+        self.assertEqual(result.dropped_sections, ["历史点单记录"])
+        self.assertLessEqual(result.tokens_after, budget)
+
+        result = self.compactor.compact(PROMPT, token_budget=1)
+        self.assertEqual(result.dropped_sections, ["历史点单记录", "外部条件影响"])
+        self.assertIn("当前用户请求：来点清淡的", result.text)
+        self.assertTrue(result.text.endswith("请根据以上信息综合判断并提供服务。"))
+
+    def test_report_per_template(self):
+        self.compactor.compact(PROMPT, "a")
+        self.compactor.compact(PROMPT, "a")
+        self.compactor.compact("当前用户请求：你好", "b")
+        report = self.compactor.report()
+        self.assertEqual(report["a"]["count"], 2)
+        self.assertGreater(report["a"]["saved_ratio"], 0)
+        self.assertEqual(report["b"]["saved_ratio"], 0.0)
+        self.assertEqual(self.compactor.metrics.counter("prompt_tokens_before_total", template="b"),
+                         estimate_tokens("当前用户请求：你好"))
+
+
+if __name__ == '__main__':
+    unittest.main()
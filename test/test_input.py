@@ -0,0 +1,143 @@
+import io
+import os
+import sys
+import tempfile
+import types
+import unittest
+import warnings
+import wave
+from unittest import mock
+from flask import Flask
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import aifc
+
+
+class FakeAudioFile:
+    """按 speech_recognition.AudioFile 的顺序尝试 WAV、AIFF、FLAC，失败的尝试不回到开头"""
+
+    def __init__(self, filename_or_fileobject):
+        self.filename_or_fileobject = filename_or_fileobject
+
+    def __enter__(self):
+        source = self.filename_or_fileobject
+        try:
+            reader = wave.open(source, "rb")
+            self.format = "wav"
+        except (wave.Error, EOFError):
+            try:
+                reader = aifc.open(source, "rb")
+                self.format = "aiff"
+            except (aifc.Error, EOFError):
+                data = source.read()
+                if not data.startswith(b"fLaC"):
+                    raise ValueError("Audio file could not be read as PCM WAV, AIFF/AIFF-C, or Native FLAC")
+                self.format = "flac"
+                self.frames = data
+                return self
+        self.frames = reader.readframes(reader.getnframes())
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeRecognizer:
+    def record(self, source):
+        return source.format, source.frames
+
+    def recognize_google(self, audio, language=None):
+        audio_format, frames = audio
+        return f"{audio_format}:{len(frames)}"
+
+
+sr_stub = types.ModuleType("speech_recognition")
+sr_stub.AudioFile = FakeAudioFile
+sr_stub.Recognizer = FakeRecognizer
+sr_stub.UnknownValueError = type("UnknownValueError", (Exception,), {})
+sr_stub.RequestError = type("RequestError", (Exception,), {})
+
+with mock.patch.dict(sys.modules, {"speech_recognition": sr_stub}):
+    sys.modules.pop("collector.input", None)
+    from collector import input as input_module
+
+
+def make_wav(frames=1600):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes(b"\x01\x00" * frames)
+    return buffer.getvalue()
+
+
+class UnclosableBytesIO(io.BytesIO):
+    """aifc 写完后会关闭文件对象，保留内容以便读取"""
+
+    def close(self):
+        pass
+
+
+def make_aiff(frames=800):
+    buffer = UnclosableBytesIO()
+    writer = aifc.open(buffer, "wb")
+    writer.setnchannels(1)
+    writer.setsampwidth(2)
+    writer.setframerate(16000)
+    writer.writeframes(b"\x00\x01" * frames)
+    writer.close()
+    return buffer.getvalue()
+
+
+class TestAudioUpload(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        self.collector = input_module.InputCollector(app)
+        self.collector.register_routes()
+        self.client = app.test_client()
+        cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        self.addCleanup(os.chdir, cwd)
+
+    def upload(self, data, filename):
+        return self.client.post("/upload/audio", data={"file": (io.BytesIO(data), filename)},
+                                content_type="multipart/form-data")
+
+    def test_wav_aiff_and_flac_uploads(self):
+        cases = (
+            (make_wav(), "recording.wav", "wav:3200"),
+            (make_aiff(), "recording.aiff", "aiff:1600"),
+            (b"fLaC" + b"\x00" * 60, "recording.flac", "flac:64"),
+        )
+        for data, filename, expected in cases:
+            response = self.upload(data, filename)
+            self.assertEqual(response.status_code, 200, response.get_json())
+            self.assertEqual(response.get_json()["content"], expected)
+        self.assertFalse(os.path.exists(os.path.join(self.workdir, "audio_uploads")))
+        self.assertEqual(os.listdir(self.workdir), [])
+
+    def test_recognize_audio_rewinds_buffer(self):
+        for data, expected in ((make_wav(), "wav:3200"), (make_aiff(), "aiff:1600")):
+            buffer = io.BytesIO(data)
+            buffer.seek(len(data))
+            self.assertEqual(self.collector.recognize_audio(buffer), expected)
+
+    def test_spooled_buffer_stays_in_memory(self):
+        created = []
+        original = tempfile.SpooledTemporaryFile
+
+        def spy(*args, **kwargs):
+            created.append(original(*args, **kwargs))
+            return created[-1]
+
+        with mock.patch.object(input_module.tempfile, "SpooledTemporaryFile", spy):
+            self.assertEqual(self.upload(make_wav(), "recording.wav").status_code, 200)
+        self.assertEqual(len(created), 1)
+        self.assertFalse(created[0]._rolled)
+
+
+if __name__ == '__main__':
+    unittest.main()
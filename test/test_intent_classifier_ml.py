@@ -0,0 +1,204 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from collector.prompt_builder import intent_classifier_ml
+from collector.prompt_builder.batching import BatchQueueFull
+from collector.prompt_builder.intent_classifier_ml import IntentClassifierML
+from collector.prompt_builder.lazy import JIEBA, LazyResource
+
+
+class FakeLTP:
+    """按 jieba 分词模拟 LTP pipeline 的输出，并记录每次调用的批大小"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def pipeline(self, texts, tasks=None, raw_format=True):
+        self.batch_sizes.append(len(texts))
+        cws = [list(JIEBA.get().cut(text)) for text in texts]
+        return SimpleNamespace(
+            cws=cws,
+            pos=[["n"] * len(words) for words in cws],
+            dep=[["OBJ"] * len(words) for words in cws]
+        )
+
+
+class TestIntentClassifierML(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.TemporaryDirectory()
+        cls.classifier = IntentClassifierML(model_path=cls.model_dir.name)
+        cls.classifier.load_or_train()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model_dir.cleanup()
+
+    def setUp(self):
+        self.fake_ltp = FakeLTP()
+        patcher = mock.patch.object(intent_classifier_ml, "LTP_MODEL", LazyResource(lambda: self.fake_ltp))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_load_or_train_reuses_artifact(self):
+        self.assertIsNotNone(self.classifier.model_version)
+        reloaded = IntentClassifierML(model_path=self.model_dir.name)
+        self.assertTrue(reloaded.load())
+        self.assertEqual(reloaded.model_version, self.classifier.model_version)
+
+    def test_classify_batch_matches_classify(self):
+        texts = ["玩什么游戏好？", "有没有低脂的减肥餐", "帮我订桌位"]
+        slots_list = [None, {"健康偏好": "低脂"}, None]
+        results = self.classifier.classify_batch(texts, slots_list)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(self.fake_ltp.batch_sizes, [3])
+        for text, slots, ranked in zip(texts, slots_list, results):
+            self.assertEqual(ranked[0][0], self.classifier.classify(text, slots))
+            scores = [score for _, score in ranked]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_classify_batch_empty(self):
+        self.assertEqual(self.classifier.classify_batch([]), [])
+        with self.assertRaises(ValueError):
+            self.classifier.classify_batch(["你好"], [None, None])
+
+    def test_compact_model_equivalent(self):
+        compact = IntentClassifierML(model_path=self.model_dir.name, compact=True)
+        self.assertTrue(compact.load())
+        self.assertIsNotNone(compact.compact_model)
+        self.assertEqual(type(compact.compact_model.coef).__name__, "memmap")
+
+        texts = ["玩什么游戏好？", "有没有低脂的减肥餐", "帮我订桌位", "完全无关的一句话"]
+        expected = self.classifier.classify_batch(texts)
+        actual = compact.classify_batch(texts)
+        for expected_ranked, actual_ranked in zip(expected, actual):
+            self.assertEqual(expected_ranked[0][0], actual_ranked[0][0])
+            expected_scores = dict(expected_ranked)
+            for intent, score in actual_ranked:
+                self.assertAlmostEqual(score, expected_scores[intent], places=5)
+
+    def test_compact_exported_for_legacy_artifact(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            legacy_dir = os.path.join(tmp_dir, "model")
+            shutil.copytree(self.model_dir.name, legacy_dir, ignore=shutil.ignore_patterns("compact"))
+            compact = IntentClassifierML(model_path=legacy_dir, compact=True)
+            self.assertTrue(compact.load())
+            self.assertIsNotNone(compact.compact_model)
+            self.assertEqual(type(compact.compact_model.coef).__name__, "memmap")
+            self.assertEqual(sorted(os.listdir(os.path.join(legacy_dir, "compact"))),
+                             ["coef.npy", "idf.npy", "intercept.npy", "meta.json", "term_hashes.npy"])
+
+            texts = ["玩什么游戏好？", "帮我订桌位"]
+            self.assertEqual([ranked[0][0] for ranked in compact.classify_batch(texts)],
+                             [ranked[0][0] for ranked in self.classifier.classify_batch(texts)])
+
+    def test_cache_skips_inference(self):
+        classifier = IntentClassifierML(model_path=self.model_dir.name, cache_size=8)
+        self.assertTrue(classifier.load())
+        first = classifier.classify_batch(["来几瓶啤酒"])[0]
+        second = classifier.classify_batch(["来几瓶啤酒 "])[0]
+        self.assertEqual(first, second)
+        self.assertEqual(self.fake_ltp.batch_sizes, [1])
+        self.assertEqual(classifier.cache_stats()["hits"], 1)
+
+        # 重新加载模型后缓存失效
+        classifier.load()
+        classifier.classify_batch(["来几瓶啤酒"])
+        self.assertEqual(self.fake_ltp.batch_sizes, [1, 1])
+
+    def test_syntax_batching_merges_concurrent_requests(self):
+        classifier = IntentClassifierML(model_path=self.model_dir.name, syntax_batching=True,
+                                        batch_window_ms=50, max_batch_size=8)
+        self.addCleanup(classifier._syntax_batcher.close)
+        texts = ["玩什么游戏好", "帮我订桌位", "有没有素菜", "来点清淡的"]
+        results = {}
+        barrier = threading.Barrier(len(texts))
+
+        def worker(text):
+            barrier.wait()
+            results[text] = classifier.analyze_syntax(text)
+
+        threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(len(self.fake_ltp.batch_sizes), len(texts))
+        for text in texts:
+            self.assertEqual("".join(word for word, _, _ in results[text]), text)
+
+    def test_syntax_timeout_falls_back(self):
+        classifier = IntentClassifierML(model_path=self.model_dir.name, syntax_batching=True,
+                                        syntax_timeout=0.05, cache_size=8)
+        self.assertTrue(classifier.load())
+        self.addCleanup(classifier._syntax_batcher.close)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        blocking = mock.patch.object(self.fake_ltp, "pipeline",
+                                     side_effect=lambda *args, **kwargs: release.wait(5) and None)
+        expected = classifier.classify_batch(["来几瓶啤酒"], use_syntax=False)[0]
+        before = intent_classifier_ml.METRICS.counter("syntax_fallbacks_total", reason="timeout")
+
+        with blocking:
+            ranked = classifier.classify_batch(["来几瓶啤酒"])[0]
+        self.assertEqual(ranked, expected)
+        self.assertEqual(intent_classifier_ml.METRICS.counter("syntax_fallbacks_total", reason="timeout"),
+                         before + 1)
+        # 降级结果不写入缓存，恢复后重新计算句法增强
+        release.set()
+        classifier.classify_batch(["来几瓶啤酒"])
+        self.assertEqual(classifier.cache_stats()["hits"], 0)
+
+    def test_syntax_queue_full_falls_back(self):
+        classifier = IntentClassifierML(model_path=self.model_dir.name, syntax_batching=True)
+        self.assertTrue(classifier.load())
+        self.addCleanup(classifier._syntax_batcher.close)
+        expected = classifier.classify_batch(["玩什么游戏好"], use_syntax=False)[0]
+        before = intent_classifier_ml.METRICS.counter("syntax_fallbacks_total", reason="queue_full")
+
+        with mock.patch.object(classifier._syntax_batcher, "submit", side_effect=BatchQueueFull("队列已满")):
+            self.assertEqual(classifier.classify_batch(["玩什么游戏好"])[0], expected)
+            self.assertEqual(classifier.classify("玩什么游戏好"), expected[0][0])
+            self.assertEqual(classifier.apply_syntax("玩什么游戏好", expected), expected)
+        self.assertEqual(intent_classifier_ml.METRICS.counter("syntax_fallbacks_total", reason="queue_full"),
+                         before + 3)
+
+    def test_multi_text_batch_goes_through_batcher(self):
+        classifier = IntentClassifierML(model_path=self.model_dir.name, syntax_batching=True,
+                                        batch_window_ms=20, max_batch_size=8)
+        self.assertTrue(classifier.load())
+        self.addCleanup(classifier._syntax_batcher.close)
+        texts = ["玩什么游戏好？", "有没有低脂的减肥餐", "帮我订桌位"]
+        expected = self.classifier.classify_batch(texts)
+        self.fake_ltp.batch_sizes.clear()
+
+        with mock.patch.object(classifier, "analyze_syntax_batch",
+                               wraps=classifier.analyze_syntax_batch) as direct:
+            self.assertEqual(classifier.classify_batch(texts), expected)
+        direct.assert_not_called()
+        self.assertEqual(classifier._syntax_batcher.items, 3)
+        self.assertEqual(sum(self.fake_ltp.batch_sizes), 3)
+
+    def test_multi_text_batch_respects_queue_limit(self):
+        classifier = IntentClassifierML(model_path=self.model_dir.name, syntax_batching=True)
+        self.assertTrue(classifier.load())
+        self.addCleanup(classifier._syntax_batcher.close)
+        texts = ["玩什么游戏好", "帮我订桌位"]
+        expected = classifier.classify_batch(texts, use_syntax=False)
+        before = intent_classifier_ml.METRICS.counter("syntax_fallbacks_total", reason="queue_full")
+
+        with mock.patch.object(classifier._syntax_batcher, "submit", side_effect=BatchQueueFull("队列已满")):
+            self.assertEqual(classifier.classify_batch(texts), expected)
+        self.assertEqual(self.fake_ltp.batch_sizes, [])
+        self.assertEqual(intent_classifier_ml.METRICS.counter("syntax_fallbacks_total", reason="queue_full"),
+                         before + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
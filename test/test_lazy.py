@@ -0,0 +1,41 @@
+import threading
+import unittest
+from collector.prompt_builder.lazy import LazyResource
+
+
+class TestLazyResource(unittest.TestCase):
+    def test_factory_runs_once_under_concurrency(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            calls.append(1)
+            return object()
+
+        resource = LazyResource(factory)
+        self.assertFalse(resource.loaded)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(resource.get())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertTrue(resource.loaded)
+
+    def test_reset(self):
+        resource = LazyResource(lambda: object())
+        first = resource.get()
+        resource.reset()
+        self.assertIsNot(resource.get(), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
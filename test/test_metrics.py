@@ -0,0 +1,58 @@
+import unittest
+from collector.prompt_builder.cache import LRUCache
+from collector.prompt_builder.metrics import METRICS, MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry(window=100)
+
+    def test_quantiles(self):
+        for ms in range(1, 101):
+            self.metrics.observe("intent", ms / 1000)
+        stats = self.metrics.snapshot()["stages"]["intent"]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50"], 0.05)
+        self.assertAlmostEqual(stats["p95"], 0.095)
+        self.assertAlmostEqual(stats["p99"], 0.099)
+
+    def test_quantiles_use_recent_window(self):
+        for _ in range(100):
+            self.metrics.observe("weather", 10.0)
+        for _ in range(100):
+            self.metrics.observe("weather", 0.01)
+        stats = self.metrics.snapshot()["stages"]["weather"]
+        self.assertEqual(stats["count"], 200)
+        self.assertAlmostEqual(stats["p99"], 0.01)
+
+    def test_timer_counts_errors(self):
+        with self.metrics.timer("render"):
+            pass
+        with self.assertRaises(KeyError):
+            with self.metrics.timer("render"):
+                raise KeyError("template")
+        self.assertEqual(self.metrics.snapshot()["stages"]["render"]["count"], 2)
+        self.assertEqual(self.metrics.counter("errors_total", stage="render"), 1)
+
+    def test_render_prometheus(self):
+        self.metrics.observe("clean", 0.001)
+        self.metrics.inc("cache_hits_total", cache="intent_ml")
+        self.metrics.inc("cache_hits_total", cache="intent_ml")
+        text = self.metrics.render_prometheus()
+        self.assertIn('waiter_stage_duration_seconds{stage="clean",quantile="0.5"} 0.001', text)
+        self.assertIn('waiter_stage_duration_seconds_count{stage="clean"} 1', text)
+        self.assertIn("# TYPE waiter_cache_hits_total counter", text)
+        self.assertIn('waiter_cache_hits_total{cache="intent_ml"} 2', text)
+
+    def test_named_cache_reports_hits(self):
+        before = METRICS.counter("cache_hits_total", cache="test_cache")
+        cache = LRUCache(2, name="test_cache")
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+        self.assertEqual(METRICS.counter("cache_hits_total", cache="test_cache"), before + 1)
+        self.assertEqual(METRICS.counter("cache_misses_total", cache="test_cache"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
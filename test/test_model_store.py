@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+import unittest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from collector.prompt_builder.model_store import (
+    file_sha256,
+    save_artifact,
+    load_artifact,
+    read_manifest
+)
+
+
+class TestModelStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_dir = os.path.join(self.tmp_dir.name, "model")
+        self.data_path = os.path.join(self.tmp_dir.name, "data.json")
+        with open(self.data_path, "w", encoding="utf-8") as f:
+            json.dump([{"text": "点 菜", "intent": "order"}], f)
+
+        self.model = Pipeline([('tfidf', TfidfVectorizer()), ('clf', LogisticRegression())])
+        self.model.fit(["点 菜", "下 单", "玩 游戏", "打 麻将"], ["order", "order", "game", "game"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        data_hash = file_sha256(self.data_path)
+        manifest = save_artifact(self.model, self.model_dir, data_hash, ["order", "game"])
+        self.assertEqual(manifest["labels"], ["game", "order"])
+        self.assertIn("scikit-learn", manifest["library_versions"])
+        self.assertEqual(read_manifest(self.model_dir), manifest)
+
+        model, loaded_manifest = load_artifact(self.model_dir, data_hash)
+        self.assertEqual(loaded_manifest["data_sha256"], data_hash)
+        self.assertEqual(model.predict(["玩 游戏"]).tolist(), ["game"])
+
+    def test_stale_or_missing_artifact(self):
+        self.assertIsNone(load_artifact(self.model_dir))
+        save_artifact(self.model, self.model_dir, file_sha256(self.data_path), ["order", "game"])
+
+        with open(self.data_path, "w", encoding="utf-8") as f:
+            json.dump([{"text": "打 麻将", "intent": "game"}], f)
+        self.assertIsNone(load_artifact(self.model_dir, file_sha256(self.data_path)))
+        # 不校验数据哈希时仍可加载
+        self.assertIsNotNone(load_artifact(self.model_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
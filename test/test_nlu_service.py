@@ -0,0 +1,50 @@
+import unittest
+from collector.prompt_builder.nlu_service import IntentClassifier
+
+
+class TestIntentClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = IntentClassifier()
+
+    def test_keyword_scores(self):
+        self.assertEqual(self.classifier.classify("我们想玩什么好，斗地主还是狼人杀"), "game_recommendation")
+        self.assertEqual(self.classifier.classify("可以打包外卖吗"), "takeaway_service")
+
+    def test_tie_uses_priority(self):
+        # "无糖" 同时命中 healthy_diet 与 intermittent_fasting，按优先级取后者
+        self.assertEqual(self.classifier.classify("有无糖的吗"), "intermittent_fasting")
+        # 没有任何命中时取优先级最高的意图
+        self.assertEqual(self.classifier.classify("你好"), "festival")
+
+    def test_weather_slot_does_not_raise(self):
+        self.assertEqual(self.classifier.classify("吃点什么", {"天气状态": "寒冷"}), "weather_based")
+        self.assertEqual(self.classifier.classify("吃点什么", {"天气状态": "炎热"}), "seasonal_food")
+
+    def test_rank_top_k(self):
+        ranked = self.classifier.rank("高蛋白的健身餐", top_k=3)
+        self.assertEqual(len(ranked), 3)
+        # 同分时 healthy_diet 在优先级列表中，排在 fitness_nutrition 之前
+        self.assertEqual(ranked[0], ("healthy_diet", 2))
+        self.assertEqual(ranked[1], ("fitness_nutrition", 2))
+        self.assertEqual(ranked[2][1], 0)
+        self.assertEqual(len(self.classifier.rank("你好")), len(self.classifier.intent_rules))
+
+    def test_reload_rules(self):
+        self.classifier.reload_rules({"order": ["点菜"], "game_recommendation": ["麻将"]})
+        self.assertEqual(self.classifier.classify("打麻将"), "game_recommendation")
+
+    def test_cache(self):
+        classifier = IntentClassifier(cache_size=16)
+        self.assertIsNone(self.classifier.cache_stats())
+        self.assertEqual(classifier.classify("打包外卖"), "takeaway_service")
+        self.assertEqual(classifier.classify(" 打包外卖 "), "takeaway_service")
+        self.assertEqual(classifier.cache_stats()["hits"], 1)
+
+        # 规则重新加载后缓存失效
+        classifier.reload_rules({"order": ["打包"]})
+        self.assertEqual(classifier.cache_stats()["size"], 0)
+        self.assertEqual(classifier.classify("打包外卖"), "order")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import unittest
+from collector.prompt_builder.metrics import MetricsRegistry
+from collector.prompt_builder.profile_cache import ProfileCache
+from collector.prompt_builder.prompt import PromptBuilder
+from database import DB
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, user_id):
+        self.calls.append(user_id)
+        return DB.get_user_profile(user_id)
+
+
+class TestProfileCache(unittest.TestCase):
+    def setUp(self):
+        self.loader = CountingLoader()
+        self.cache = ProfileCache(maxsize=2, ttl=60, loader=self.loader, metrics=MetricsRegistry())
+        self.addCleanup(self.cache.close)
+
+    def test_single_load_per_user(self):
+        profile = self.cache.get("U123456")
+        self.assertEqual(profile["played_games"], ["麻将", "斗地主"])
+        self.cache.get("U123456")
+        self.assertEqual(self.loader.calls, ["U123456"])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(self.cache.metrics.snapshot()["stages"]["profile_load"]["count"], 1)
+
+    def test_lru_eviction(self):
+        for user_id in ("U123456", "U987654", "U000000"):
+            self.cache.get(user_id)
+        self.cache.get("U123456")
+        self.assertEqual(self.loader.calls, ["U123456", "U987654", "U000000", "U123456"])
+
+    def test_record_order_invalidates(self):
+        user_id = "U_PROFILE_TEST"
+        self.assertEqual(self.cache.get(user_id)["order_history"], [])
+        DB.record_order(user_id, ["酸菜鱼"])
+        self.assertEqual(self.cache.get(user_id)["order_history"], ["酸菜鱼"])
+        self.assertEqual(len(self.loader.calls), 2)
+
+        # 注销后不再接收下单通知
+        self.cache.close()
+        DB.record_order(user_id, ["米饭"])
+        self.assertEqual(self.cache.get(user_id)["order_history"], ["酸菜鱼"])
+
+    def test_invalidation_during_load_not_lost(self):
+        user_id = "U_PROFILE_RACE"
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_loader(uid):
+            profile = DB.get_user_profile(uid)
+            self.loader.calls.append(uid)
+            if len(self.loader.calls) == 1:
+                started.set()
+                release.wait(5)
+            return profile
+
+        cache = ProfileCache(ttl=300, loader=blocking_loader, metrics=MetricsRegistry())
+        self.addCleanup(cache.close)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(cache.get(user_id)))
+        thread.start()
+        self.assertTrue(started.wait(5))
+        DB.record_order(user_id, ["酸菜鱼"])
+        release.set()
+        thread.join()
+
+        # 加载期间的下单不能被旧数据覆盖
+        self.assertEqual(results[0]["order_history"], [])
+        self.assertEqual(cache.get(user_id)["order_history"], ["酸菜鱼"])
+        self.assertEqual(len(self.loader.calls), 2)
+        self.assertEqual(cache.get(user_id)["order_history"], ["酸菜鱼"])
+        self.assertEqual(len(self.loader.calls), 2)
+
+    def test_builder_uses_cache(self):
+        builder = PromptBuilder(profile_cache=self.cache, metrics=MetricsRegistry())
+        text = "4个人，朋友聚会，来个饭前游戏"
+        expected = PromptBuilder().build_prompt(text, user_id="U123456")
+        self.assertEqual(builder.build_prompt(text, user_id="U123456"), expected)
+        self.assertEqual(asyncio.run(builder.build_prompt_async(text, user_id="U123456")), expected)
+        self.assertEqual(self.loader.calls, ["U123456"])
+
+
+if __name__ == '__main__':
+    unittest.main()
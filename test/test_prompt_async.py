@@ -0,0 +1,84 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+from collector.prompt_builder import prompt
+from collector.prompt_builder.metrics import MetricsRegistry
+from collector.prompt_builder.prompt import PromptBuilder
+from database.DB import get_user_order_history, get_user_played_games
+from mcp.weather_client import get_weather_by_location
+
+
+def slow(func, delay):
+    def wrapper(*args):
+        time.sleep(delay)
+        return func(*args)
+    return wrapper
+
+
+class TestBuildPromptAsync(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.builder = PromptBuilder(metrics=MetricsRegistry(),
+                                    lookup_timeouts={"weather": 1, "order_history": 1, "played_games": 1})
+        cls.builder.warmup()
+
+    def setUp(self):
+        self.builder.metrics.reset()
+
+    def patch_lookups(self, weather=None, order_history=None, played_games=None):
+        for name, func in (("get_weather_by_location", weather), ("get_user_order_history", order_history),
+                           ("get_user_played_games", played_games)):
+            if func is not None:
+                patcher = mock.patch.object(prompt, name, func)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+
+    def test_matches_sync_result(self):
+        text = "4个人，朋友聚会，来个饭前游戏，顺便来几瓶啤酒"
+        expected = self.builder.build_prompt(text, user_id="U123456", location="成都")
+        actual = asyncio.run(self.builder.build_prompt_async(text, user_id="U123456", location="成都"))
+        self.assertEqual(actual, expected)
+
+    def test_lookups_run_concurrently(self):
+        self.patch_lookups(slow(get_weather_by_location, 0.2), slow(get_user_order_history, 0.2),
+                           slow(get_user_played_games, 0.2))
+        start = time.perf_counter()
+        asyncio.run(self.builder.build_prompt_async("来点清淡的", user_id="U123456"))
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_timeout_falls_back_to_default(self):
+        self.patch_lookups(weather=slow(get_weather_by_location, 0.3))
+        builder_timeouts = self.builder.lookup_timeouts
+        self.builder.lookup_timeouts = {**builder_timeouts, "weather": 0.05}
+        self.addCleanup(setattr, self.builder, "lookup_timeouts", builder_timeouts)
+
+        result = asyncio.run(self.builder.build_prompt_async("来点清淡的"))
+        self.assertIn("当前用户请求：来点清淡的", result)
+        self.assertEqual(
+            self.builder.metrics.counter("lookup_fallbacks_total", lookup="weather", reason="timeout"), 1
+        )
+
+    def test_error_falls_back_to_default(self):
+        def broken(user_id):
+            raise ConnectionError("db down")
+
+        self.patch_lookups(order_history=broken)
+        result = asyncio.run(self.builder.build_prompt_async("来点清淡的", user_id="U123456"))
+        self.assertNotIn("水煮鱼", result)
+        self.assertEqual(
+            self.builder.metrics.counter("lookup_fallbacks_total", lookup="order_history", reason="error"), 1
+        )
+
+    def test_async_lookup_function(self):
+        async def weather(location):
+            await asyncio.sleep(0)
+            return get_weather_by_location(location)
+
+        expected = self.builder.build_prompt("来点清淡的")
+        self.patch_lookups(weather=weather)
+        self.assertEqual(asyncio.run(self.builder.build_prompt_async("来点清淡的")), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
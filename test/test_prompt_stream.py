@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from flask import Flask
+from collector.prompt_builder.prompt import PromptBuilder, iter_nonempty_lines
+from collector.prompt_builder import prompt as prompt_module
+from collector.prompt_routes import PromptRoutes
+
+
+class TestIterNonemptyLines(unittest.TestCase):
+    def assertMatchesRemoveEmptyLines(self, text, chunk_size=4):
+        expected = PromptBuilder.remove_empty_lines(None, text)
+        for size in (1, 3, len(text) or 1):
+            fragments = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual("".join(iter_nonempty_lines(fragments, chunk_size)), expected)
+
+    def test_equivalent_to_remove_empty_lines(self):
+        self.assertMatchesRemoveEmptyLines("  第一行  \n\n   \n第二行\r\n\r\n第三行\n")
+        self.assertMatchesRemoveEmptyLines("\n\n只有一行")
+        self.assertMatchesRemoveEmptyLines("")
+        self.assertMatchesRemoveEmptyLines("a b\x0cc\r")
+
+    def test_chunk_size(self):
+        chunks = list(iter_nonempty_lines(["甲\n乙\n", "丙\n丁\n"], chunk_size=3))
+        self.assertEqual(chunks, ["甲\n乙", "\n丙\n丁"])
+
+
+class TestPromptStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.builder = PromptBuilder()
+
+    def setUp(self):
+        app = Flask(__name__)
+        PromptRoutes(app, prompt_builder=self.builder).register_routes()
+        self.client = app.test_client()
+
+    def test_stream_matches_build_prompt(self):
+        text = "4个人，朋友聚会，来个饭前游戏，顺便来几瓶啤酒"
+        expected = self.builder.build_prompt(text, user_id="U123456", location="成都")
+        chunks = list(self.builder.build_prompt_stream(text, user_id="U123456", location="成都", chunk_size=16))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), expected)
+
+    def test_stream_route(self):
+        response = self.client.post("/prompt/stream", json={"text": "我想吃点清淡的菜，不吃海鲜。"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.get_data(as_text=True), self.builder.build_prompt("我想吃点清淡的菜，不吃海鲜。"))
+
+    def test_stream_route_errors(self):
+        self.assertEqual(self.client.post("/prompt/stream", json={}).status_code, 400)
+        response = self.client.post("/prompt/stream", json={"text": "你好", "template_name": "no_such_template"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_lazy_builder_created_once(self):
+        created = []
+
+        def slow_builder(**kwargs):
+            time.sleep(0.05)
+            created.append(kwargs)
+            return self.builder
+
+        routes = PromptRoutes(Flask(__name__), builder_options={"intent_cache_size": 8})
+        with mock.patch.object(prompt_module, "PromptBuilder", slow_builder):
+            threads = [threading.Thread(target=lambda: routes.prompt_builder) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(created, [{"intent_cache_size": 8}])
+        self.assertIs(routes.prompt_builder, self.builder)
+
+
+if __name__ == '__main__':
+    unittest.main()
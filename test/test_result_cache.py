@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+from collector.prompt_builder import prompt as prompt_module
+from collector.prompt_builder.metrics import METRICS, MetricsRegistry
+from collector.prompt_builder.prompt import PromptBuilder
+from collector.prompt_builder.result_cache import PromptResultCache, profile_version
+
+
+class TestPromptResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = PromptResultCache(maxsize=16)
+        self.builder = PromptBuilder(result_cache=self.cache, metrics=MetricsRegistry())
+        self.plain = PromptBuilder(metrics=MetricsRegistry())
+
+    def test_same_result_as_uncached(self):
+        for text, user_id in (("4个人，朋友聚会，来个饭前游戏", None),
+                              ("今天好热，想吃点清爽的", "U123456"),
+                              ("想吃火锅", "U987654")):
+            expected = self.plain.build_prompt(text, user_id=user_id)
+            self.assertEqual(self.builder.build_prompt(text, user_id=user_id), expected)
+            self.assertEqual(self.builder.build_prompt(text, user_id=user_id), expected)
+        self.assertEqual(self.cache.stats()["hits"], 3)
+
+    def test_hit_skips_analysis_and_keeps_raw_request(self):
+        self.builder.build_prompt("想吃点清淡的  不要辣")
+        with mock.patch.object(self.builder, "_analyze_input") as analyze:
+            prompt = self.builder.build_prompt(" 想吃点清淡的　不要辣")
+        analyze.assert_not_called()
+        self.assertIn("想吃点清淡的　不要辣", prompt)
+        self.assertEqual(prompt, self.plain.build_prompt(" 想吃点清淡的　不要辣"))
+
+    def test_context_changes_miss(self):
+        text = "想吃点清淡的"
+        self.builder.build_prompt(text, location="北京")
+        self.builder.build_prompt(text, location="上海")
+        self.builder.build_prompt(text, template_name="enhanced_basic_with_all")
+        with mock.patch.object(prompt_module, "get_weather_by_location",
+                               return_value={"weather": "暴雨", "temperature": 12}):
+            self.builder.build_prompt(text, location="北京")
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_template_reload_misses(self):
+        text = "想吃点清淡的"
+        self.builder.build_prompt(text)
+        self.assertTrue(self.builder.template_manager.reload())
+        self.builder.build_prompt(text)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_counters_use_builder_registry(self):
+        registry = MetricsRegistry()
+        builder = PromptBuilder(result_cache=PromptResultCache(), intent_cache_size=16, metrics=registry)
+        before = METRICS.counter("cache_hits_total", cache="prompt_result")
+        builder.build_prompt("想吃点清淡的")
+        builder.build_prompt("想吃点清淡的")
+        self.assertEqual(registry.counter("cache_hits_total", cache="prompt_result"), 1)
+        self.assertEqual(registry.counter("cache_misses_total", cache="intent_rule"), 1)
+        self.assertEqual(METRICS.counter("cache_hits_total", cache="prompt_result"), before)
+
+    def test_profile_version(self):
+        self.assertIsNone(profile_version([], []))
+        self.assertEqual(profile_version(["水煮鱼"], []), profile_version(["水煮鱼"], []))
+        self.assertNotEqual(profile_version(["水煮鱼"], []), profile_version(["水煮鱼", "米饭"], []))
+
+    def test_memory_bound(self):
+        cache = PromptResultCache(max_bytes=1000)
+        cache.put("a", "t", "x" * 600)
+        cache.put("b", "t", "y" * 600)
+        self.assertIsNone(cache.get("a"))
+        self.assertLessEqual(cache.stats()["bytes"], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
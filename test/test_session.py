@@ -0,0 +1,112 @@
+import unittest
+from collector.prompt_builder.metrics import MetricsRegistry
+from collector.prompt_builder.prompt import PromptBuilder
+from collector.prompt_builder.result_cache import PromptResultCache
+from collector.prompt_builder.session import TURN_TEXT_LIMIT, DialogueState, SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_slots_merge_incrementally(self):
+        store = SessionStore()
+        store.append("s1", "4个人聚会", {"人数": 4, "场景": "朋友聚会"})
+        store.append("s1", "想吃川菜，改成6个人", {"人数": 6, "菜系": "川菜"})
+        slots, history = store.snapshot("s1")
+        self.assertEqual(slots, {"人数": 6, "场景": "朋友聚会", "菜系": "川菜"})
+        self.assertEqual(history, "用户：4个人聚会\n用户：想吃川菜，改成6个人")
+        self.assertEqual(store.snapshot("unknown"), ({}, ""))
+
+    def test_list_slots_accumulate(self):
+        store = SessionStore()
+        store.append("s1", "我对花生过敏，不吃辣", {"过敏原": ["花生"], "忌口": ["不吃辣"]})
+        store.append("s1", "另外我海鲜过敏", {"过敏原": ["海鲜", "花生"], "忌口": ["海鲜过敏"]})
+        slots, _ = store.snapshot("s1")
+        self.assertEqual(slots, {"过敏原": ["花生", "海鲜"], "忌口": ["不吃辣", "海鲜过敏"]})
+
+    def test_size_includes_accumulated_slots(self):
+        state = DialogueState(max_turns=1)
+        state.add_turn("你好", {})
+        size = state.nbytes
+        state.add_turn("你好", {"忌口": ["不吃辣" * 50]})
+        self.assertGreater(state.nbytes, size + 300)
+
+    def test_ring_buffer_bounds_turns(self):
+        state = DialogueState(max_turns=3)
+        for i in range(10, 20):
+            state.add_turn(f"第{i}轮", {"人数": i})
+        self.assertEqual([turn.text for turn in state.turns], ["第17轮", "第18轮", "第19轮"])
+        self.assertEqual(state.turn_count, 10)
+        self.assertEqual(state.slots, {"人数": 19})
+        size = state.nbytes
+        state.add_turn("第20轮", {"人数": 20})
+        self.assertEqual(state.nbytes, size)
+
+        state.add_turn("长" * (TURN_TEXT_LIMIT * 2), {})
+        self.assertEqual(len(state.turns[-1].text), TURN_TEXT_LIMIT)
+
+    def test_idle_sessions_expire(self):
+        clock = FakeClock()
+        store = SessionStore(ttl=60, clock=clock)
+        store.append("s1", "你好", {})
+        clock.now = 50
+        store.append("s1", "来点饮料", {"饮品": "可乐"})
+        clock.now = 100
+        self.assertEqual(store.snapshot("s1")[0], {"饮品": "可乐"})
+        clock.now = 161
+        self.assertEqual(store.snapshot("s1"), ({}, ""))
+
+    def test_memory_cap_evicts_oldest_session(self):
+        state = DialogueState()
+        state.add_turn("你好" * 20, {})
+        store = SessionStore(max_bytes=state.nbytes * 2)
+        for session_id in ("s1", "s2", "s3"):
+            store.append(session_id, "你好" * 20, {})
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.snapshot("s1"), ({}, ""))
+        store.end("s3")
+        self.assertEqual(len(store), 1)
+
+
+class TestPromptBuilderSession(unittest.TestCase):
+    def setUp(self):
+        self.store = SessionStore()
+        self.builder = PromptBuilder(session_store=self.store, metrics=MetricsRegistry())
+
+    def test_history_and_slots_carry_over(self):
+        self.builder.build_prompt("4个人，朋友聚会", session_id="s1")
+        prompt = self.builder.build_prompt("来点饮料", session_id="s1", template_name="enhanced_basic_with_all")
+        self.assertIn("历史对话", prompt)
+        self.assertIn("用户：4个人，朋友聚会", prompt)
+        self.assertIn("朋友聚会", prompt.split("历史对话")[0])
+        self.assertNotIn("用户：来点饮料", prompt)
+        self.assertIn("用户：来点饮料", self.store.snapshot("s1")[1])
+
+    def test_list_slots_carry_over_in_prompt(self):
+        self.builder.build_prompt("我对花生过敏，不吃辣", session_id="s3")
+        prompt = self.builder.build_prompt("另外我海鲜过敏", session_id="s3", template_name="enhanced_basic_with_all")
+        self.assertIn("过敏原规避：['花生', '海鲜']", prompt)
+        self.assertIn("不吃辣", prompt.split("历史对话")[0])
+
+    def test_without_session_id_unchanged(self):
+        text = "4个人，朋友聚会，来个饭前游戏"
+        self.assertEqual(self.builder.build_prompt(text), PromptBuilder().build_prompt(text))
+        self.assertEqual(len(self.store), 0)
+
+    def test_session_bypasses_result_cache(self):
+        cache = PromptResultCache()
+        builder = PromptBuilder(session_store=self.store, result_cache=cache, metrics=MetricsRegistry())
+        builder.build_prompt("来点饮料", session_id="s2")
+        builder.build_prompt("来点饮料", session_id="s2")
+        self.assertEqual(cache.stats()["size"], 0)
+        self.assertEqual(self.store.snapshot("s2")[1].count("来点饮料"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
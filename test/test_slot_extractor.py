@@ -0,0 +1,115 @@
+import unittest
+from fuzzywuzzy import process
+from collector.prompt_builder.lexicon import KeywordAutomaton
+from collector.prompt_builder.fuzzy_index import FuzzySlotIndex
+from collector.prompt_builder.slot_extractor import (
+    extract_slots,
+    extract_slot_spans,
+    slots_from_matches,
+    find_slot_hits,
+    build_slot_automaton
+)
+
+
+class TestKeywordAutomaton(unittest.TestCase):
+    def test_overlapping_matches(self):
+        automaton = KeywordAutomaton([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+        matches = automaton.find_all("ushers")
+        self.assertEqual(
+            sorted((start, end, keyword) for start, end, keyword, _ in matches),
+            [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+        )
+
+    def test_empty_text(self):
+        automaton = KeywordAutomaton([("麻辣", None)])
+        self.assertEqual(automaton.find_all(""), [])
+        self.assertFalse(automaton.contains_any(None))
+
+
+class TestSlotExtractor(unittest.TestCase):
+    def test_find_slot_hits_spans(self):
+        text = "想吃火锅，花生过敏"
+        hits = find_slot_hits(text)
+        self.assertIn((2, 4, "菜系", "火锅"), hits)
+        self.assertIn((2, 4, "就餐形式", "火锅"), hits)
+        self.assertIn((5, 7, "过敏原", "花生"), hits)
+        for start, end, _, keyword in hits:
+            self.assertEqual(text[start:end], keyword)
+
+    def test_find_slot_hits_explicit_empty_automaton(self):
+        self.assertEqual(find_slot_hits("想吃火锅，花生过敏", KeywordAutomaton()), [])
+
+    def test_keyword_order_priority(self):
+        # 同一槽位命中多个关键词时，取词表中排序靠前的
+        automaton = build_slot_automaton({"口味": ["不辣", "微辣就行"]})
+        hits = find_slot_hits("微辣就行，最好不辣", automaton)
+        self.assertEqual(len(hits), 2)
+        slots = extract_slots("微辣就行，最好不辣")
+        self.assertEqual(slots["口味"], "不辣")
+
+    def test_extract_slots(self):
+        slots = extract_slots("4个人，来个饭前游戏，顺便来几瓶啤酒")
+        self.assertEqual(slots["人数"], 4)
+        self.assertEqual(slots["饮品"], "啤酒")
+        slots = extract_slots("花生过敏，不吃鱼虾")
+        self.assertEqual(slots["过敏原"], ["花生"])
+        self.assertEqual(slots["忌口"], ["不吃鱼虾"])
+
+    def test_extract_slot_spans(self):
+        text = "我们6位，想吃川菜，要四川那种味道"
+        matches = extract_slot_spans(text)
+        sources = {match.slot: match.source for match in matches}
+        self.assertEqual(sources["人数"], "numeric")
+        self.assertEqual(sources["菜系"], "exact")
+        for match in matches:
+            if match.source == "exact":
+                self.assertEqual(text[match.start:match.end], match.value)
+        self.assertEqual(slots_from_matches(matches), extract_slots(text))
+
+    def test_token_boundaries_prefer_word_internal_hit(self):
+        # "不辣" 跨越 "不 / 辣的" 的词边界，提供分词后应选择不跨词的 "辣的"
+        text = "不辣的"
+        self.assertEqual(extract_slots(text)["口味"], "不辣")
+        matches = extract_slot_spans(text, ["不", "辣的"])
+        self.assertEqual(slots_from_matches(matches)["口味"], "辣的")
+        # 分词与原文不一致时忽略分词边界
+        matches = extract_slot_spans(text, ["不辣"])
+        self.assertEqual(slots_from_matches(matches)["口味"], "不辣")
+
+
+class TestFuzzySlotIndex(unittest.TestCase):
+    def setUp(self):
+        self.slot_dict = {
+            "口味": ["不要太油腻", "四川那种味道", "微辣就行"],
+            "饮品": ["啤酒", "来点冰的"],
+            "就餐形式": ["想吃多少拿多少就拿多少"]
+        }
+        self.index = FuzzySlotIndex(self.slot_dict)
+
+    def test_same_score_as_extract_one(self):
+        for text in ["想吃点不太油腻的", "四川味道", "来点冰冰的吧", "今天我们想吃多少拿多少都拿多少好吗", "微辣", "辣"]:
+            for slot_name, keywords in self.slot_dict.items():
+                expected_alias, expected_score = process.extractOne(text, keywords)
+                matched = self.index.match(text, threshold=80, slot_names=[slot_name]).get(slot_name)
+                if expected_score >= 80:
+                    self.assertEqual((matched.alias, matched.score), (expected_alias, expected_score))
+                else:
+                    self.assertIsNone(matched)
+
+    def test_threshold_and_span(self):
+        text = "今天我们想吃多少拿多少都拿多少好吗"
+        matched = self.index.match(text)["就餐形式"]
+        self.assertEqual(matched.alias, "想吃多少拿多少就拿多少")
+        self.assertGreaterEqual(matched.score, 80)
+        self.assertEqual(text[matched.start:matched.end], "想吃多少拿多少都拿多少")
+        self.assertEqual(self.index.match(text, threshold=100), {})
+
+    def test_match_batch(self):
+        texts = ["来点冰冰的", "随便", "来点冰冰的"]
+        results = self.index.match_batch(texts)
+        self.assertEqual(results, [self.index.match(text) for text in texts])
+        self.assertEqual(results[1], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
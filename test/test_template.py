@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from jinja2 import Environment
+from collector.prompt_builder.config import INTENT_TO_TEMPLATE_MAP
+from collector.prompt_builder.template import DEFAULT_TEMPLATE_PATH, PromptTemplateLoader
+
+
+class TestPromptTemplateLoader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.loader = PromptTemplateLoader()
+
+    def test_all_templates_compiled(self):
+        for name, versions in self.loader.templates.items():
+            for lang in versions:
+                self.assertIn((name, lang), self.loader.registry)
+        for template_name in INTENT_TO_TEMPLATE_MAP.values():
+            self.assertIn((template_name, "zh-CN"), self.loader.registry)
+
+    def test_render_does_not_recompile(self):
+        with mock.patch.object(Environment, "from_string") as from_string, \
+                mock.patch.object(Environment, "parse") as parse:
+            prompt = self.loader.get_template("enhanced_basic_with_all", user_request="订个包间", city=None)
+        from_string.assert_not_called()
+        parse.assert_not_called()
+        self.assertIn("当前用户请求：订个包间", prompt)
+
+    def test_variables_precomputed(self):
+        compiled = self.loader.get_compiled("enhanced_basic_with_all")
+        self.assertIn("user_request", compiled.variables)
+        self.assertNotIn("unused_variable", compiled.variables)
+
+    def test_unknown_template(self):
+        with self.assertRaises(ValueError):
+            self.loader.get_template("no_such_template")
+        with self.assertRaises(ValueError):
+            self.loader.get_template("enhanced_basic_with_all", lang="xx-XX")
+
+    def test_bytecode_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            PromptTemplateLoader(bytecode_cache_dir=cache_dir)
+            self.assertTrue(os.listdir(cache_dir))
+            warm = PromptTemplateLoader(bytecode_cache_dir=cache_dir)
+            self.assertEqual(
+                warm.get_template("enhanced_basic_with_all", user_request="你好"),
+                self.loader.get_template("enhanced_basic_with_all", user_request="你好")
+            )
+
+
+class TestTemplateHotReload(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "prompt_templates.yaml")
+        shutil.copy(DEFAULT_TEMPLATE_PATH, self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.original = f.read()
+        self.loader = PromptTemplateLoader(self.path)
+
+    def write(self, content):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(content)
+        # 保证 mtime 变化可被检测到
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    def render(self):
+        return self.loader.get_template("enhanced_basic_with_all", user_request="你好")
+
+    def test_reload_on_change(self):
+        self.assertFalse(self.loader.check_for_update())
+        self.write(self.original.replace("你是一个智能服务员", "你是一个热情的服务员", 1))
+        self.assertTrue(self.loader.check_for_update())
+        self.assertEqual(self.loader.version, 2)
+        self.assertIn("你是一个热情的服务员", self.render())
+
+    def test_invalid_template_keeps_old_version(self):
+        before = self.render()
+        self.write(self.original + "\nbroken_template:\n  zh-CN: \"{% if %}\"\n")
+        self.assertFalse(self.loader.check_for_update())
+        self.assertEqual(self.render(), before)
+        self.assertEqual(self.loader.version, 1)
+
+    def test_missing_language_rejected(self):
+        self.write(self.original + "\nextra_template:\n  en-US: \"hello\"\n")
+        self.assertFalse(self.loader.reload())
+        self.assertNotIn("extra_template", self.loader.templates)
+
+    def test_in_flight_render_uses_old_version(self):
+        compiled = self.loader.get_compiled("enhanced_basic_with_all")
+        self.write(self.original.replace("你是一个智能服务员", "新版本服务员", 1))
+        self.assertTrue(self.loader.reload())
+        self.assertIn("你是一个智能服务员", compiled.template.render(user_request="你好"))
+        self.assertIn("新版本服务员", self.render())
+
+    def test_watcher_thread(self):
+        self.loader.start_watching(interval=0.01)
+        self.addCleanup(self.loader.stop_watching)
+        self.write(self.original.replace("你是一个智能服务员", "后台加载的服务员", 1))
+        deadline = time.time() + 2
+        while self.loader.version == 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertIn("后台加载的服务员", self.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
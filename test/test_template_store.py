@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+from collector.prompt_builder import template
+from collector.prompt_builder.template import PromptTemplateLoader, YamlTemplateSource
+from database.template_store import SQLiteTemplateSource
+
+
+class TestDatabaseTemplateSource(unittest.TestCase):
+    def setUp(self):
+        self.source = SQLiteTemplateSource()
+        self.addCleanup(self.source.close)
+        templates, _, _ = YamlTemplateSource().load()
+        self.source.import_templates(templates, "v1")
+        self.loader = PromptTemplateLoader(source=self.source)
+
+    def render(self, **kwargs):
+        return self.loader.get_template("enhanced_basic_with_all", user_request="你好", **kwargs)
+
+    def test_loads_active_templates(self):
+        compiled = self.loader.get_compiled("enhanced_basic_with_all")
+        self.assertEqual(compiled.version, "v1")
+        self.assertIn("当前用户请求：你好", self.render())
+
+    def test_render_does_not_query_database(self):
+        self.render()
+        with mock.patch.object(self.source, "_cursor") as cursor:
+            self.render()
+            self.render(version="v1")
+        cursor.assert_not_called()
+
+    def test_publish_invalidates_by_version(self):
+        self.assertFalse(self.loader.check_for_update())
+        self.source.publish("enhanced_basic_with_all", "zh-CN", "v2", "新版本：{{ user_request }}")
+        self.assertTrue(self.loader.check_for_update())
+        self.assertEqual(self.render(), "新版本：你好")
+        self.assertEqual(self.loader.get_compiled("enhanced_basic_with_all").version, "v2")
+
+        # 回滚到旧版本
+        self.source.activate("enhanced_basic_with_all", "zh-CN", "v1")
+        self.assertTrue(self.loader.check_for_update())
+        self.assertIn("当前用户请求：你好", self.render())
+
+    def test_pin_version_per_request(self):
+        self.source.publish("enhanced_basic_with_all", "zh-CN", "v2-b", "B 组：{{ user_request }}", activate=False)
+        self.assertIn("当前用户请求：你好", self.render())
+        self.assertEqual(self.render(version="v2-b"), "B 组：你好")
+        with mock.patch.object(self.source, "_cursor") as cursor:
+            self.assertEqual(self.render(version="v2-b"), "B 组：你好")
+        cursor.assert_not_called()
+        with self.assertRaises(ValueError):
+            self.render(version="v9")
+
+    def test_unknown_pinned_version_cached(self):
+        with self.assertRaises(ValueError):
+            self.render(version="v9")
+        with mock.patch.object(self.source, "load_version") as load_version:
+            for _ in range(3):
+                with self.assertRaises(ValueError):
+                    self.render(version="v9")
+        load_version.assert_not_called()
+
+        # 发布并激活后重新加载，之前不存在的版本可以使用
+        self.source.publish("enhanced_basic_with_all", "zh-CN", "v9", "v9：{{ user_request }}")
+        self.assertTrue(self.loader.check_for_update())
+        self.assertEqual(self.render(version="v9"), "v9：你好")
+
+    def test_unknown_pinned_version_expires(self):
+        now = [0.0]
+        self.loader._pinned_missing._clock = lambda: now[0]
+        with self.assertRaises(ValueError):
+            self.render(version="v2-c")
+        self.source.publish("enhanced_basic_with_all", "zh-CN", "v2-c", "C 组：{{ user_request }}", activate=False)
+        with self.assertRaises(ValueError):
+            self.render(version="v2-c")
+        now[0] = template.PINNED_MISS_TTL + 1
+        self.assertEqual(self.render(version="v2-c"), "C 组：你好")
+
+    def test_pinned_cache_bounded(self):
+        with mock.patch.object(template, "PINNED_CACHE_SIZE", 1):
+            loader = PromptTemplateLoader(source=self.source)
+        for version in ("v2-a", "v2-b"):
+            self.source.publish("enhanced_basic_with_all", "zh-CN", version, version, activate=False)
+            loader.get_compiled("enhanced_basic_with_all", version=version)
+        self.assertEqual(len(loader._pinned), 1)
+
+    def test_duplicate_version_rejected(self):
+        with self.assertRaises(ValueError):
+            self.source.publish("enhanced_basic_with_all", "zh-CN", "v1", "重复")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import threading
+import time
+import unittest
+from collector.prompt_builder.metrics import MetricsRegistry
+from collector.prompt_builder.prompt import PromptBuilder
+from mcp.weather_client import UNKNOWN_WEATHER, FakeWeatherProvider, WeatherCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.005)
+
+
+class TestWeatherCache(unittest.TestCase):
+    def make_cache(self, provider, **kwargs):
+        cache = WeatherCache(provider, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_fresh_hit(self):
+        provider = FakeWeatherProvider()
+        cache = self.make_cache(provider, ttl=60)
+        self.assertEqual(cache.get("北京")["weather"], "晴朗")
+        self.assertEqual(cache.get("北京")["weather"], "晴朗")
+        self.assertEqual(provider.calls, ["北京"])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_stale_served_while_refreshing(self):
+        clock = FakeClock()
+        provider = FakeWeatherProvider()
+        cache = self.make_cache(provider, ttl=60, clock=clock)
+        cache.get("北京")
+        provider.data["北京"] = {"weather": "小雨", "temperature": 18}
+        provider.delay = 0.1
+        clock.now = 61
+
+        # 过期后立即返回旧值，并发请求只触发一次刷新
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("北京"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual({r["weather"] for r in results}, {"晴朗"})
+
+        wait_until(lambda: cache.get("北京")["weather"] == "小雨")
+        self.assertEqual(provider.calls, ["北京", "北京"])
+        self.assertEqual(cache.stats()["refreshes"], 2)
+
+    def test_failed_refresh_keeps_stale_value(self):
+        clock = FakeClock()
+        provider = FakeWeatherProvider()
+        cache = self.make_cache(provider, ttl=60, clock=clock)
+        cache.get("上海")
+        provider.fail = True
+        clock.now = 61
+        self.assertEqual(cache.get("上海")["weather"], "多云")
+        wait_until(lambda: cache.stats()["errors"] == 1)
+        self.assertEqual(cache.get("上海")["weather"], "多云")
+
+    def test_slow_miss_falls_back_then_fills(self):
+        provider = FakeWeatherProvider(delay=0.2)
+        cache = self.make_cache(provider, ttl=60, timeout=0.01)
+        start = time.monotonic()
+        self.assertEqual(cache.get("广州"), UNKNOWN_WEATHER)
+        self.assertLess(time.monotonic() - start, 0.15)
+        self.assertEqual(cache.stats()["fallbacks"], 1)
+        wait_until(lambda: cache.stats()["size"] == 1)
+        self.assertEqual(cache.get("广州")["weather"], "炎热")
+        self.assertEqual(provider.calls, ["广州"])
+
+    def test_failed_miss_falls_back(self):
+        cache = self.make_cache(FakeWeatherProvider(fail=True), fallback={"weather": "晴", "temperature": 22})
+        self.assertEqual(cache.get("成都"), {"weather": "晴", "temperature": 22})
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_entries_past_stale_window_are_evicted(self):
+        clock = FakeClock()
+        provider = FakeWeatherProvider(delay=0.2)
+        cache = self.make_cache(provider, ttl=60, max_stale=120, timeout=1.0, clock=clock)
+        cache.get("北京")
+        provider.data["北京"] = {"weather": "小雨", "temperature": 18}
+        clock.now = 181
+        self.assertEqual(cache.get("北京")["weather"], "小雨")
+        stats = cache.stats()
+        self.assertEqual((stats["stale_hits"], stats["misses"], stats["expirations"]), (0, 2, 1))
+
+    def test_bounded_by_city_count(self):
+        cache = self.make_cache(FakeWeatherProvider(), maxsize=2)
+        for location in ("北京", "上海", "广州", "成都"):
+            cache.get(location)
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_counters_reach_registry(self):
+        clock = FakeClock()
+        registry = MetricsRegistry()
+        cache = self.make_cache(FakeWeatherProvider(), ttl=60, clock=clock, metrics=registry)
+        cache.get("北京")
+        cache.get("北京")
+        clock.now = 61
+        cache.get("北京")
+        wait_until(lambda: registry.counter("weather_refreshes_total") == 2)
+        self.assertEqual(registry.counter("cache_misses_total", cache="weather"), 1)
+        self.assertEqual(registry.counter("cache_hits_total", cache="weather"), 2)
+        self.assertEqual(registry.counter("weather_stale_hits_total"), 1)
+
+    def test_builder_uses_cache(self):
+        provider = FakeWeatherProvider()
+        cache = self.make_cache(provider, ttl=60)
+        builder = PromptBuilder(weather_cache=cache, metrics=MetricsRegistry())
+        text = "4个人，朋友聚会，来个饭前游戏"
+        expected = PromptBuilder().build_prompt(text, location="北京")
+        self.assertEqual(builder.build_prompt(text, location="北京"), expected)
+        self.assertEqual(builder.build_prompt(text, location="北京"), expected)
+        self.assertEqual(provider.calls, ["北京"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 # waiter.py
-from flask import Flask
+from flask import Flask, Response
 from collector.input import InputCollector
+from collector.prompt_routes import PromptRoutes
+from collector.prompt_builder.metrics import METRICS
 
 def create_app():
     app = Flask(__name__)
@@ -9,6 +11,15 @@ def create_app():
     collector = InputCollector(app)
     collector.register_routes()
 
+    # 提示词构建接口
+    prompt_routes = PromptRoutes(app)
+    prompt_routes.register_routes()
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus 文本格式的提示词流水线指标"""
+        return Response(METRICS.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
     return app
 
 if __name__ == '__main__':